@@ -0,0 +1,90 @@
+import asyncio
+import statistics
+import sys
+import time
+from typing import AsyncGenerator
+from google.adk.agents.llm_agent import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from app.voice_agent.session import SessionRegistry
+
+
+# Stubbed llm answering with the last user message after a fixed delay
+class StubLlm(BaseLlm):
+    delay: float = 0.05
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.delay)
+        query = llm_request.contents[-1].parts[0].text
+        yield LlmResponse(
+            content=types.Content(
+                role="model", parts=[types.Part(text=f"Answer to: {query}")]
+            )
+        )
+
+
+# Drive one simulated caller through its turns, checking it only ever sees its own answers
+async def _simulate_session(registry: SessionRegistry, index: int, turns: int):
+    latencies, cross_talk = [], 0
+    pipeline = await registry.acquire(
+        session_id=f"session-{index}", user_id=f"user-{index}"
+    )
+    try:
+        for turn in range(turns):
+            query = f"caller {index} question {turn}"
+            start = time.perf_counter()
+            answer = None
+            async for event in pipeline.call_agent(query=query):
+                if event.is_final_response():
+                    answer = event.content.parts[0].text
+            latencies.append(time.perf_counter() - start)
+            cross_talk += answer != f"Answer to: {query}"
+    finally:
+        registry.release(pipeline)
+    return latencies, cross_talk
+
+
+async def run_sessions(num_sessions: int, turns: int, llm_delay: float):
+    agent = LlmAgent(
+        model=StubLlm(model="stub", delay=llm_delay),
+        name="load_test_agent",
+        instruction="Answer the user in one line",
+    )
+    registry = SessionRegistry(
+        agent=agent,
+        app_name="voice-agent-load-test",
+        session_service=InMemorySessionService(),
+        max_sessions=num_sessions,
+        idle_timeout=900,
+    )
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[_simulate_session(registry, i, turns) for i in range(num_sessions)]
+    )
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for session, _ in results for latency in session)
+    overhead = [latency - llm_delay for latency in latencies]
+    report = {
+        "sessions": num_sessions,
+        "turns": len(latencies),
+        "turns_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "p50_overhead_ms": round(statistics.median(overhead) * 1000, 2),
+        "cross_talk": sum(errors for _, errors in results),
+    }
+    print(report)
+    return report
+
+
+# Poetry run statement to load test the session pipelines with a stubbed llm
+def run_load_test():
+    num_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    llm_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    asyncio.run(run_sessions(num_sessions, turns, llm_delay))
@@ -0,0 +1,119 @@
+import asyncio
+import random
+import statistics
+import sys
+import time
+from google.adk.agents.llm_agent import LlmAgent
+from google.adk.sessions import InMemorySessionService
+from app.benchmark.load_test import StubLlm
+from app.benchmark.results import write_results
+from app.benchmark.stand_ins import NullAudioSink, use_stand_in_settings
+from app.config.settings import get_settings
+from app.voice_agent.conversation import VoiceConversation
+from app.voice_agent.session import SessionRegistry
+
+
+# Feed one caller's utterances as transcripts, returns the latency from the final
+# transcript to the agent's response for every utterance
+async def _simulate_caller(
+    conversation: VoiceConversation, utterances, segment_gap: float
+):
+    latencies = []
+    for segments, final in utterances:
+        for segment in segments:
+            await conversation.on_transcript(segment, False)
+            await asyncio.sleep(segment_gap)
+        final_at = time.perf_counter()
+        await conversation.on_transcript(final, True)
+        while True:
+            event_name, _ = await conversation.message_queue.get()
+            if event_name == "agent":
+                latencies.append(time.perf_counter() - final_at)
+            elif event_name in ("metrics", "error"):
+                break
+    return latencies
+
+
+# Utterances made of interim segments and the final segment, for a share of them
+# the final segment changes the sentence enough to discard the speculative turn
+def _build_utterances(count: int, mismatch_rate: float, seed: int = 0):
+    rng = random.Random(seed)
+    utterances = []
+    for index in range(count):
+        segments = [f"what does the guide say about topic {index}"]
+        if rng.random() < mismatch_rate:
+            final = "and how does it compare with the previous release of the product"
+        else:
+            final = ""
+        utterances.append((segments, final))
+    return utterances
+
+
+async def _run_mode(speculative: bool, utterances, llm_delay: float, segment_gap):
+    # Each mode gets its own copy, the cached settings are left untouched
+    settings = get_settings().model_copy(update={"SPECULATIVE_TURNS": speculative})
+    agent = LlmAgent(
+        model=StubLlm(model="stub", delay=llm_delay),
+        name="speculation_benchmark_agent",
+        instruction="Answer the user in one line",
+    )
+    registry = SessionRegistry(
+        agent=agent,
+        app_name="voice-agent-speculation-benchmark",
+        session_service=InMemorySessionService(),
+        max_sessions=1,
+        idle_timeout=900,
+    )
+    pipeline = await registry.acquire(session_id="speculation", user_id="benchmark")
+    conversation = VoiceConversation(
+        pipeline=pipeline,
+        synthesize=lambda text: b"",
+        sink=NullAudioSink(),
+        settings=settings,
+    )
+    try:
+        latencies = await _simulate_caller(conversation, utterances, segment_gap)
+    finally:
+        await conversation.close()
+        registry.release(pipeline)
+    return latencies, conversation.speculation_stats.report()
+
+
+async def run_benchmark(
+    utterances: int, llm_delay: float, segment_gap: float, mismatch_rate: float
+):
+    scenario = _build_utterances(utterances, mismatch_rate)
+    baseline, _ = await _run_mode(False, scenario, llm_delay, segment_gap)
+    speculative, speculation = await _run_mode(True, scenario, llm_delay, segment_gap)
+    report = {
+        "utterances": utterances,
+        "mismatch_rate": mismatch_rate,
+        "baseline_p50_ms": round(statistics.median(baseline) * 1000, 2),
+        "speculative_p50_ms": round(statistics.median(speculative) * 1000, 2),
+        "baseline_mean_ms": round(statistics.mean(baseline) * 1000, 2),
+        "speculative_mean_ms": round(statistics.mean(speculative) * 1000, 2),
+        # Every discarded turn started at least one llm call the baseline doesn't make
+        "extra_llm_calls": speculation["wasted_turns"],
+        "speculation": speculation,
+    }
+    config = {
+        "utterances": utterances,
+        "llm_delay_ms": llm_delay * 1000,
+        "segment_gap_ms": segment_gap * 1000,
+        "mismatch_rate": mismatch_rate,
+        "speculation_similarity": get_settings().SPECULATION_SIMILARITY,
+    }
+    path = write_results("speculation", config, report)
+    print(f"{report}\nResults written to {path}")
+    return report
+
+
+# Poetry run statement to compare the turn latency with and without speculative turns
+# Arguments: utterances, llm delay, gap between the interim and final transcript, mismatch rate
+def run_speculation_benchmark():
+    utterances = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    llm_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    segment_gap = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    mismatch_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.2
+    use_stand_in_settings()
+    asyncio.run(run_benchmark(utterances, llm_delay, segment_gap, mismatch_rate))
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import time
+from app.voice_agent.audio import AudioSink
+
+# Settings of the external services, none of them is called by the benchmarks
+STAND_IN_SETTINGS = {
+    "DEEPGRAM_API_KEY": "stand-in",
+    "APP_NAME": "voice-agent-benchmark",
+    "MCP_SERVER_URL": "http://127.0.0.1:1/mcp",
+    "MODEL_NAME": "stand-in",
+    "GOOGLE_API_KEY": "stand-in",
+    "ELEVEN_LABS_API_KEY": "stand-in",
+}
+
+
+# Fill the settings of the external services the environment and .env leave
+# unset, must run before the settings are loaded
+def use_stand_in_settings():
+    for name, value in STAND_IN_SETTINGS.items():
+        os.environ.setdefault(name, value)
+
+
+# Text to speech stand-in, blocks like the real client for a fixed delay
+# and returns audio whose length follows the text's
+def fake_synthesizer(delay: float, bytes_per_char: int = 100):
+    def synthesize(text: str):
+        time.sleep(delay)
+        return b"\0" * (len(text) * bytes_per_char)
+
+    return synthesize
+
+
+# Plays the audio in real time without a device, bytes_per_second=0 discards it
+class NullAudioSink(AudioSink):
+    def __init__(self, bytes_per_second: float = 0):
+        self.bytes_per_second = bytes_per_second
+
+    async def play(self, audio: bytes):
+        if self.bytes_per_second:
+            await asyncio.sleep(len(audio) / self.bytes_per_second)
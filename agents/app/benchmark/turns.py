@@ -0,0 +1,120 @@
+import asyncio
+import sys
+import time
+from google.adk.agents.llm_agent import LlmAgent
+from google.adk.sessions import InMemorySessionService
+from app.benchmark.load_test import StubLlm
+from app.benchmark.results import latency_summary, write_results
+from app.benchmark.stand_ins import (
+    NullAudioSink,
+    fake_synthesizer,
+    use_stand_in_settings,
+)
+from app.config.settings import get_settings
+from app.voice_agent.conversation import VoiceConversation
+from app.voice_agent.session import SessionRegistry
+from app.voice_agent.stt import FakeSTT
+
+
+# One caller saying its sentences one after another, returns the turn breakdowns
+async def _simulate_caller(
+    registry: SessionRegistry, index: int, turns: int, stt_delay: float, synthesize
+):
+    pipeline = await registry.acquire(
+        session_id=f"session-{index}", user_id=f"user-{index}"
+    )
+    stt = FakeSTT(delay=stt_delay)
+    # 16 kHz mono linear16 playback speed
+    conversation = VoiceConversation(
+        pipeline=pipeline,
+        synthesize=synthesize,
+        sink=NullAudioSink(bytes_per_second=32000),
+    )
+    await stt.start(
+        on_transcript=conversation.on_transcript, on_error=conversation.on_error
+    )
+    breakdowns, errors = [], 0
+    try:
+        for turn in range(turns):
+            await stt.say(f"caller {index} question {turn}")
+            while True:
+                event_name, payload = await conversation.message_queue.get()
+                if event_name == "turn_breakdown":
+                    breakdowns.append(payload)
+                    break
+                if event_name == "error":
+                    errors += 1
+                    break
+    finally:
+        await conversation.close()
+        await stt.finish()
+        registry.release(pipeline)
+    return breakdowns, errors
+
+
+async def run_benchmark(
+    sessions: int, turns: int, stt_delay: float, llm_delay: float, tts_delay: float
+):
+    agent = LlmAgent(
+        model=StubLlm(model="stub", delay=llm_delay),
+        name="turn_benchmark_agent",
+        instruction="Answer the user in one line",
+    )
+    registry = SessionRegistry(
+        agent=agent,
+        app_name="voice-agent-turn-benchmark",
+        session_service=InMemorySessionService(),
+        max_sessions=sessions,
+        idle_timeout=900,
+    )
+    synthesize = fake_synthesizer(tts_delay)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[
+            _simulate_caller(registry, i, turns, stt_delay, synthesize)
+            for i in range(sessions)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+
+    stages: dict[str, list[float]] = {}
+    for breakdowns, _ in results:
+        for breakdown in breakdowns:
+            for stage, ms in breakdown["stages_ms"].items():
+                stages.setdefault(stage, []).append(ms / 1000)
+            # From the end of the caller's speech, the stand-in stt included
+            if "time_to_first_audio" in breakdown["stages_ms"]:
+                stages.setdefault("end_of_speech_to_first_audio", []).append(
+                    stt_delay + breakdown["stages_ms"]["time_to_first_audio"] / 1000
+                )
+    completed = sum(len(breakdowns) for breakdowns, _ in results)
+    report = {
+        "turns": completed,
+        "errors": sum(errors for _, errors in results),
+        "turns_per_second": round(completed / elapsed, 2),
+        "stages": {stage: latency_summary(values) for stage, values in stages.items()},
+    }
+    config = {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "stt_delay_ms": stt_delay * 1000,
+        "llm_delay_ms": llm_delay * 1000,
+        "tts_delay_ms": tts_delay * 1000,
+        "max_concurrent_llm_calls": get_settings().MAX_CONCURRENT_LLM_CALLS,
+    }
+    path = write_results("turns", config, report)
+    print(f"{report}\nResults written to {path}")
+    return report
+
+
+# Poetry run statement to measure the end to end turn latency of concurrent callers
+# with stand-ins for the stt, llm and tts, arguments: sessions, turns per session,
+# stt delay, llm delay and tts delay in seconds
+def run_turn_benchmark():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    stt_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    llm_delay = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+    tts_delay = float(sys.argv[5]) if len(sys.argv) > 5 else 0.1
+    use_stand_in_settings()
+    asyncio.run(run_benchmark(sessions, turns, stt_delay, llm_delay, tts_delay))
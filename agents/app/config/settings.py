@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Literal
 
 
 # Import all settings
@@ -10,6 +11,54 @@ class Settings(BaseSettings):
     MODEL_NAME: str
     GOOGLE_API_KEY: str
     ELEVEN_LABS_API_KEY: str
+    # Session pipelines kept alive, idle ones expire after SESSION_IDLE_TIMEOUT seconds
+    MAX_SESSIONS: int = 100
+    SESSION_IDLE_TIMEOUT: float = 900
+    # Stream the llm response and speak it sentence by sentence while it is generated
+    TTS_STREAMING: bool = False
+    # Shorter clauses are merged with the next one before synthesis
+    TTS_MIN_SEGMENT_CHARS: int = 20
+    # Stop the agent's speech as soon as the user starts speaking
+    BARGE_IN: bool = True
+    # supersede: a new sentence cancels the running turn, queue: every sentence gets its turn
+    TURN_POLICY: Literal["supersede", "queue"] = "supersede"
+    # Agent turns running at the same time across every session
+    MAX_CONCURRENT_LLM_CALLS: int = 8
+    # Speech to text backend of the websocket callers, fake runs locally without deepgram
+    STT_BACKEND: Literal["deepgram", "fake"] = "deepgram"
+    # Transcript of every utterance ended by the VAD with the fake backend
+    FAKE_STT_TRANSCRIPT: str = "What is in the knowledge base?"
+    # Audio frames of a websocket caller buffered before the socket stops being read
+    AUDIO_FRAME_QUEUE_SIZE: int = 50
+    # Drop the silence frames locally and end the utterance after VAD_HANGOVER_MS of silence
+    VAD_ENABLED: bool = False
+    # RMS amplitude of a linear16 frame counted as speech
+    VAD_THRESHOLD: float = 500
+    VAD_HANGOVER_MS: float = 400
+    # Silence sent ahead of the speech so its start isn't cut
+    VAD_PRE_ROLL_MS: float = 200
+    # Start the agent turn on the stable interim transcript and commit it when the
+    # final transcript is at least SPECULATION_SIMILARITY similar
+    SPECULATIVE_TURNS: bool = False
+    SPECULATION_SIMILARITY: float = 0.9
+    # Shorter interim transcripts aren't worth a speculative turn
+    SPECULATION_MIN_CHARS: int = 10
+    # Elevenlabs voice and model of the agent's speech
+    TTS_VOICE_ID: str = "XrExE9yKIg1WjnnlVkGX"
+    TTS_MODEL_ID: str = "eleven_multilingual_v2"
+    # Size budget of the in memory tts cache in bytes
+    TTS_CACHE_MEMORY_BYTES: int = 32 * 1024 * 1024
+    # Sqlite file of the persistent tts cache, leave empty to disable it
+    TTS_CACHE_PATH: str | None = ".cache/tts.sqlite3"
+    # Size budget of the persistent tts cache in bytes
+    TTS_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Spoken while a tool runs, the full tool call is still sent as an event
+    TOOL_CALL_FILLER: str = "Please hold on while I look that up."
+    # Phrases synthesized at startup so they play instantly
+    TTS_FILLER_PHRASES: list[str] = []
+    # Log the breakdown of every turn as a json span, joined with the spans of the
+    # tools and ingestion services on the trace id
+    LOG_TRACE_SPANS: bool = True
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,17 +1,23 @@
 import asyncio
 from app.config.settings import get_settings
-from deepgram import (
-    DeepgramClient,
-    DeepgramClientOptions,
-    LiveTranscriptionEvents,
-    LiveOptions,
-    Microphone,
+from deepgram import Microphone
+from app.voice_agent.agent import (
+    session_registry,
+    toolset,
+    synthesize,
+    prerender_fillers,
 )
-from app.voice_agent.agent import call_agent, text_to_speech
+from app.voice_agent.audio import MpvAudioSink, WebSocketAudioSink
+from app.voice_agent.conversation import VoiceConversation
+from app.voice_agent.stt import create_stt_backend
 import warnings
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket
+from starlette.websockets import WebSocketState
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import render_metrics
 from sse_starlette.sse import EventSourceResponse
 import json
+from contextlib import asynccontextmanager
 import uvicorn
 import os
 
@@ -22,132 +28,71 @@ os.environ["GOOGLE_API_KEY"] = get_settings().GOOGLE_API_KEY
 warnings.filterwarnings("ignore")
 
 
-# To collect all the transcriptions parts to get the full sentence
-class TranscriptCollector:
-    def __init__(self):
-        self.reset()
+# Wrap plain text messages into the event payload
+def to_payload(text):
+    return text if isinstance(text, dict) else {"text": text}
 
-    def reset(self):
-        self.transcript_parts = []
 
-    def add_part(self, part):
-        self.transcript_parts.append(part)
-
-    def get_full_transcript(self):
-        return " ".join(self.transcript_parts)
-
-
-# Initalizing the transcription collector
-transcript_collector = TranscriptCollector()
-
-
-async def get_transcript(request: Request, session_id: int, user_id: int):
+async def get_transcript(request: Request, session_id: str, user_id: str):
+    # The session's runner lives across utterances
+    pipeline = await session_registry.acquire(session_id=session_id, user_id=user_id)
+    conversation = stt = microphone = None
     try:
-        message_queue: asyncio.Queue[str] = asyncio.Queue()
-        config = DeepgramClientOptions(options={"keepalive": "true"})
-        deepgram: DeepgramClient = DeepgramClient(
-            api_key=get_settings().DEEPGRAM_API_KEY, config=config
+        stt = create_stt_backend()
+        conversation = VoiceConversation(
+            pipeline=pipeline, synthesize=synthesize, sink=MpvAudioSink()
         )
-
-        dg_connection = deepgram.listen.asynclive.v("1")
-
-        async def on_message(self, result, **kwargs):
-            sentence = result.channel.alternatives[0].transcript
-
-            if not result.speech_final:
-                transcript_collector.add_part(sentence)
-                await message_queue.put(("user", sentence))
-            else:
-                # This is the final part of the current sentence
-                transcript_collector.add_part(sentence)
-                full_sentence = transcript_collector.get_full_transcript()
-                if len(full_sentence.strip()) > 0:
-                    # Adding the speaker transcription to the message queue
-                    await message_queue.put(("user", full_sentence))
-                    async for event in call_agent(
-                        query=full_sentence, session_id=session_id, user_id=user_id
-                    ):
-                        if event.get_function_calls():
-                            tool_name = event.content.parts[0].function_call.name
-                            args_passed = event.content.parts[0].function_call.args.get(
-                                "query"
-                            )
-
-                            agent_response = f"Calling tool {tool_name} with query {args_passed} Please Hold On!"
-                            # Adding the agent doing tool call in the message queue
-                            await message_queue.put(("agent", agent_response))
-                            # Converting the text to speech back to elevenlabs to intimate the user about the tool call
-                            await asyncio.to_thread(text_to_speech, agent_response)
-                        elif event.is_final_response():
-                            agent_response = event.content.parts[0].text
-                            # Adding the agent response to the message queue
-                            await message_queue.put(("agent", agent_response))
-                            # Converting the agent response back to audio using elevenlabs
-                            await asyncio.to_thread(text_to_speech, agent_response)
-                # Reset the collector for the next sentence
-                transcript_collector.reset()
-
-        async def on_error(self, error, **kwargs):
-            # Adding the errors if there are any
-            await message_queue.put(("error", str(error)))
-
-        dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
-        dg_connection.on(LiveTranscriptionEvents.Error, on_error)
-
-        options = LiveOptions(
-            model="nova-2",
-            punctuate=True,
-            language="en-US",
-            encoding="linear16",
-            channels=1,
-            sample_rate=16000,
-            endpointing=True,
+        await stt.start(
+            on_transcript=conversation.on_transcript, on_error=conversation.on_error
         )
 
-        await dg_connection.start(options)
-
         # Open a microphone stream on the default input device
-        microphone = Microphone(dg_connection.send)
+        microphone = Microphone(stt.send)
 
         # start microphone
         microphone.start()
 
-        # Cleanup everything when closing
-        async def cleanup():
-            """Gracefully stop everything"""
+        while True:
+            if await request.is_disconnected():
+                break
             try:
-                if microphone.is_active():
-                    microphone.finish()
-                # Send a closestream to deepgram and finish
-                await dg_connection.send(json.dumps({"type": "CloseStream"}))
-                dg_connection.finish()
-            except Exception as e:
-                print(f"Cleanup error: {e}")
-
-        try:
-            while True:
-                if await request.is_disconnected():
-                    await cleanup()
-                    break
-                try:
-                    event_name, text = await asyncio.wait_for(
-                        message_queue.get(), timeout=1.0
-                    )
-                except asyncio.TimeoutError:
-                    continue
-                payload = {"text": text}
-                yield {"event": event_name, "data": json.dumps(payload)}
-
-        finally:
-            await cleanup()
+                event_name, text = await asyncio.wait_for(
+                    conversation.message_queue.get(), timeout=1.0
+                )
+            except asyncio.TimeoutError:
+                continue
+            yield {"event": event_name, "data": json.dumps(to_payload(text))}
 
     except Exception as e:
         print(f"Could not open socket: {e}")
-        return
+    finally:
+        # Cleanup whatever was started, even when the setup failed half way
+        try:
+            if conversation is not None:
+                await conversation.close()
+            if microphone is not None and microphone.is_active():
+                microphone.finish()
+            if stt is not None:
+                await stt.finish()
+        except Exception as e:
+            print(f"Cleanup error: {e}")
+        session_registry.release(pipeline)
+
+
+# Pre-render the filler phrases and close the mcp connections when the server stops
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Rendered in the background, the server doesn't wait for the tts round trips
+    prerender = asyncio.create_task(asyncio.to_thread(prerender_fillers))
+    try:
+        yield
+    finally:
+        await prerender
+        await toolset.close()
 
 
 # Initalizing the fastapi client
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 # Streaming api to stream the responses from the agent and user
@@ -158,6 +103,90 @@ async def stream_sse(request: Request, session_id: str, user_id: str):
     )
 
 
+# Prometheus style latency histograms of the voice turn stages
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics()
+
+
+# Voice api for remote callers
+# The client sends 16 kHz mono linear16 audio frames as binary messages and receives
+# the agent's audio as binary messages and the transcript/agent events as json messages
+@app.websocket("/ws")
+async def stream_websocket(websocket: WebSocket, session_id: str, user_id: str):
+    await websocket.accept()
+    sink = WebSocketAudioSink(websocket)
+    pipeline = conversation = stt = None
+    # Bounded so a slow speech to text connection pushes back on the client
+    frames: asyncio.Queue[memoryview | None] = asyncio.Queue(
+        maxsize=get_settings().AUDIO_FRAME_QUEUE_SIZE
+    )
+
+    # Forward the client's audio frames to the speech to text backend
+    async def forward_audio():
+        while (frame := await frames.get()) is not None:
+            await stt.send(frame)
+
+    # Send the conversation events back to the client
+    async def forward_events():
+        while True:
+            event_name, text = await conversation.message_queue.get()
+            await sink.send_event(event_name, to_payload(text))
+
+    # Read the client's audio frames until it disconnects
+    async def receive_audio():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                # The frame is handed over without copying it, awaiting the put
+                # stops reading from the socket while the queue is full
+                await frames.put(memoryview(message["bytes"]))
+
+    tasks = []
+    try:
+        pipeline = await session_registry.acquire(
+            session_id=session_id, user_id=user_id
+        )
+        conversation = VoiceConversation(
+            pipeline=pipeline, synthesize=synthesize, sink=sink
+        )
+        stt = create_stt_backend()
+        await stt.start(
+            on_transcript=conversation.on_transcript, on_error=conversation.on_error
+        )
+        tasks = [
+            asyncio.create_task(receive_audio()),
+            asyncio.create_task(forward_audio()),
+            asyncio.create_task(forward_events()),
+        ]
+        # The stream ends when the client disconnects or a forwarding task fails,
+        # a dead forward_audio would otherwise leave the receive loop blocked on the queue
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    except Exception as e:
+        print(f"Websocket stream failed: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            if conversation is not None:
+                await conversation.close()
+            if stt is not None:
+                await stt.finish()
+            # The client is still connected when the stream failed on the server side
+            if websocket.client_state == WebSocketState.CONNECTED:
+                await websocket.close()
+        except Exception as e:
+            print(f"Cleanup error: {e}")
+        if pipeline is not None:
+            session_registry.release(pipeline)
+
+
 # Poetry run to start the voice agent
 def start_voice_agent():
     uvicorn.run("app.main:app", host="0.0.0.0", port=8002)
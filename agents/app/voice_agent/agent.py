@@ -1,16 +1,17 @@
-from google.adk.tools.mcp_tool.mcp_toolset import (
-    MCPToolset,
-    StreamableHTTPConnectionParams,
-)
+from google.adk.tools.mcp_tool.mcp_toolset import StreamableHTTPConnectionParams
 from google.adk.agents.llm_agent import LlmAgent
-from google.genai import types
 from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
+from app.voice_agent.session import SessionRegistry
+from app.voice_agent.tracing import TracedMCPToolset
 from app.config.settings import get_settings
 from elevenlabs.client import ElevenLabs
 from opik.integrations.adk import OpikTracer
-from elevenlabs import stream
-import asyncio
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
 import warnings
 
 # Ignore all warnings
@@ -27,8 +28,8 @@ APP_NAME = get_settings().APP_NAME
 # Intializing the session service
 session_service = InMemorySessionService()
 
-# Intializing the knowledge query tool
-toolset = MCPToolset(
+# Intializing the knowledge query tool, its calls carry the trace context of the turn
+toolset = TracedMCPToolset(
     connection_params=StreamableHTTPConnectionParams(url=get_settings().MCP_SERVER_URL),
 )
 
@@ -66,62 +67,174 @@ voice_agent = LlmAgent(
 )
 
 
-# Get the current session get the current session if exists or
-# create a new session
-async def get_current_session(
-    session_servie: InMemorySessionService,
-    user_id: str,
-    session_id: str,
-):
-    current_session = await session_servie.get_session(
-        app_name=APP_NAME, user_id=user_id, session_id=session_id
-    )
-    if not current_session:
-        current_session = await session_servie.create_session(
-            app_name=APP_NAME, user_id=user_id, session_id=session_id
-        )
-
-    runner = Runner(
-        agent=voice_agent, app_name=APP_NAME, session_service=session_servie
-    )
-    return runner
+# Intializing the per session pipelines
+session_registry = SessionRegistry(
+    agent=voice_agent,
+    app_name=APP_NAME,
+    session_service=session_service,
+    max_sessions=get_settings().MAX_SESSIONS,
+    idle_timeout=get_settings().SESSION_IDLE_TIMEOUT,
+)
 
 
 # Agent Interaction
 async def call_agent(query: str, session_id: str, user_id: str):
-    runner = await get_current_session(
-        session_servie=session_service,
-        session_id=session_id,
-        user_id=user_id,
+    pipeline = await session_registry.get(session_id=session_id, user_id=user_id)
+    async for event in pipeline.call_agent(query):
+        yield event
+
+
+# Synthesized audio keyed by (voice_id, model_id, text)
+# The memory tier is an lru bounded by its size in bytes, the sqlite tier keeps the
+# audio across restarts and drops the least recently used entries over its budget
+class TTSCache:
+    def __init__(self, max_memory_bytes: int, path: str | None, max_disk_bytes: int):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS audio (
+                    key TEXT PRIMARY KEY,
+                    voice_id TEXT NOT NULL,
+                    model_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    audio BLOB NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self._db.commit()
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(audio)), 0) FROM audio"
+            ).fetchone()[0]
+
+    @staticmethod
+    def _key(voice_id: str, model_id: str, text: str):
+        return hashlib.sha256(
+            f"{voice_id}\0{model_id}\0{text}".encode("utf-8")
+        ).hexdigest()
+
+    def _remember(self, key: str, audio: bytes):
+        if key in self._entries:
+            self._memory_bytes -= len(self._entries[key])
+        self._entries[key] = audio
+        self._entries.move_to_end(key)
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # Look up the audio of the text, None if it isn't cached
+    def get(self, voice_id: str, model_id: str, text: str):
+        key = self._key(voice_id, model_id, text)
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT audio FROM audio WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE audio SET last_access = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    # Store the audio of the text in both tiers
+    def put(self, voice_id: str, model_id: str, text: str, audio: bytes):
+        key = self._key(voice_id, model_id, text)
+        with self._lock:
+            self._remember(key, audio)
+            if self._db is None:
+                return
+            previous = self._db.execute(
+                "SELECT LENGTH(audio) FROM audio WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO audio (key, voice_id, model_id, text, audio, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, voice_id, model_id, text, audio, time.time()),
+            )
+            self._disk_bytes += len(audio) - (previous[0] if previous else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+            self._db.commit()
+
+    # Drop the least recently used audio until the disk tier is back under 90% of its budget
+    def _evict(self):
+        target = int(self.max_disk_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT key, LENGTH(audio) FROM audio ORDER BY last_access"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM audio WHERE key = ?", evicted)
+
+    # Hit rate counters of the cache
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk_bytes if self._db is not None else 0,
+        }
+
+
+# Intializing the tts cache
+tts_cache = TTSCache(
+    max_memory_bytes=get_settings().TTS_CACHE_MEMORY_BYTES,
+    path=get_settings().TTS_CACHE_PATH,
+    max_disk_bytes=get_settings().TTS_CACHE_MAX_BYTES,
+)
+
+
+# Converting the text to audio using eleven labs, repeated phrases come from the cache
+def synthesize(text: str):
+    settings = get_settings()
+    voice_id, model_id = settings.TTS_VOICE_ID, settings.TTS_MODEL_ID
+    audio = tts_cache.get(voice_id, model_id, text)
+    if audio is not None:
+        return audio
+    audio_stream = elevenlabs.text_to_speech.stream(
+        text=text,
+        voice_id=voice_id,
+        model_id=model_id,
     )
-    try:
-        content = types.Content(role="user", parts=[types.Part(text=query)])
-        events = runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
-        )
-        async for event in events:
-            yield event
-    except Exception as e:
-        yield f"Agent Stopped Running {e}"
-    finally:
-        # Check of any close attribute
-        if hasattr(runner, "close"):
-            # Closing the agent runner
-            maybe_close = runner.close()
-            if asyncio.iscoroutine(maybe_close):
-                await maybe_close
-
-
-# Converting the text to speech using eleven labs
-def text_to_speech(text: str):
-    try:
-        audio_stream = elevenlabs.text_to_speech.stream(
-            text=text,
-            voice_id="XrExE9yKIg1WjnnlVkGX",
-            model_id="eleven_multilingual_v2",
-        )
-        # Play the audio
-        stream(audio_stream)
-        return "Stream Successful"
-    except Exception as e:
-        return f"Audio Stream broken {e}"
+    audio = b"".join(audio_stream)
+    if audio:
+        tts_cache.put(voice_id, model_id, text, audio)
+    return audio
+
+
+# Render the filler phrases ahead so they play without a network round trip
+def prerender_fillers():
+    settings = get_settings()
+    for phrase in [settings.TOOL_CALL_FILLER, *settings.TTS_FILLER_PHRASES]:
+        try:
+            synthesize(phrase)
+        except Exception as e:
+            print(f"Could not pre-render {phrase!r}: {e}")
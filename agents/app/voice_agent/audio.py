@@ -0,0 +1,67 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+
+# Destination of the agent's audio
+# play must return once the audio is played and stop playing when it is cancelled
+class AudioSink(ABC):
+    @abstractmethod
+    async def play(self, audio: bytes):
+        pass
+
+    # Called on barge-in, after the current play has been cancelled
+    def interrupt(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+# Plays the audio on the host's speakers through mpv
+class MpvAudioSink(AudioSink):
+    async def play(self, audio: bytes):
+        process = await asyncio.create_subprocess_exec(
+            "mpv",
+            "--no-cache",
+            "--no-terminal",
+            "--",
+            "fd://0",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            process.stdin.write(audio)
+            await process.stdin.drain()
+            process.stdin.close()
+            await process.wait()
+        except (asyncio.CancelledError, ConnectionResetError, BrokenPipeError):
+            # Stop the speech right away when it is interrupted
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+
+# Sends the agent's audio back to a remote caller over its websocket
+# The audio is sent as binary frames and the events as json text frames
+class WebSocketAudioSink(AudioSink):
+    def __init__(self, websocket):
+        self.websocket = websocket
+        # Audio and events are sent from different tasks
+        self._lock = asyncio.Lock()
+        self._control_tasks: set[asyncio.Task] = set()
+
+    async def play(self, audio: bytes):
+        async with self._lock:
+            await self.websocket.send_bytes(audio)
+
+    async def send_event(self, event: str, payload: dict):
+        async with self._lock:
+            await self.websocket.send_json({"event": event, "data": payload})
+
+    # Tell the caller to drop the audio it has buffered but not played yet
+    def interrupt(self):
+        task = asyncio.create_task(self.send_event("clear", {}))
+        self._control_tasks.add(task)
+        task.add_done_callback(self._control_tasks.discard)
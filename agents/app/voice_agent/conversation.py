@@ -0,0 +1,277 @@
+import asyncio
+import time
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from app.config.settings import Settings, get_settings
+from app.voice_agent.audio import AudioSink
+from app.voice_agent.scheduler import TurnScheduler, get_llm_limiter
+from app.voice_agent.session import SessionPipeline, TranscriptCollector
+from app.voice_agent.speculation import (
+    SpeculationStats,
+    SpeculativeTurn,
+    transcript_similarity,
+)
+from app.voice_agent.speech import AudioOutput, SentenceSplitter, SpeechPipeline
+from app.voice_agent.tracing import TurnTrace, current_trace, log_span
+
+
+# One caller's live conversation: transcripts in, agent events and speech out
+# The transport (host microphone, websocket) only feeds transcripts and drains the message queue
+class VoiceConversation:
+    def __init__(
+        self,
+        pipeline: SessionPipeline,
+        synthesize,
+        sink: AudioSink,
+        settings: Settings | None = None,
+    ):
+        self.pipeline = pipeline
+        # The benchmarks compare the settings side by side, the app uses the global ones
+        self.settings = settings or get_settings()
+        # Owned by the conversation, a reconnect or a second stream of the same
+        # session never sees the events of another one
+        self.transcript_collector = TranscriptCollector()
+        self.message_queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+        # Playback of the agent's speech, runs independently from the transcripts
+        self.audio_output = AudioOutput(synthesize=synthesize, sink=sink)
+        # Queue of the agent turns, the transcript callback never waits for the agent
+        self.scheduler = TurnScheduler(
+            run_turn=self.respond, policy=self.settings.TURN_POLICY
+        )
+        # Turn started on the interim transcript and the one committed by the final transcript
+        self.speculation: SpeculativeTurn | None = None
+        self.committed: tuple[TurnTrace, SpeculativeTurn] | None = None
+        self.speculation_stats = SpeculationStats()
+
+    # Handle a transcript from the speech to text backend
+    async def on_transcript(self, sentence: str, speech_final: bool):
+        # Barge-in: the user speaking over the agent stops its speech
+        if self.settings.BARGE_IN and sentence.strip() and self.audio_output.speaking:
+            interrupted = self.audio_output.interrupt()
+            await self.message_queue.put(
+                ("barge_in", {"interrupted_turns": interrupted})
+            )
+
+        if not speech_final:
+            self.transcript_collector.add_part(sentence)
+            await self.message_queue.put(("user", sentence))
+            if self.settings.SPECULATIVE_TURNS and sentence.strip():
+                await self._speculate(self.transcript_collector.get_full_transcript())
+        else:
+            # This is the final part of the current sentence
+            self.transcript_collector.add_part(sentence)
+            full_sentence = self.transcript_collector.get_full_transcript()
+            if len(full_sentence.strip()) > 0:
+                # Adding the speaker transcription to the message queue
+                await self.message_queue.put(("user", full_sentence))
+                trace = await self._settle_speculation(full_sentence)
+                trace.mark("stt_final")
+                # A new sentence supersedes the turns of the stale ones
+                superseded = self.scheduler.submit(trace)
+                if superseded:
+                    await self.message_queue.put(
+                        ("turn_superseded", {"superseded_turns": superseded})
+                    )
+            # Reset the collector for the next sentence
+            self.transcript_collector.reset()
+
+    # Start the agent turn on the transcript collected so far, on a fork of the session
+    # Only while no turn is running, turns on the same session never overlap
+    async def _speculate(self, query: str):
+        if len(query.strip()) < self.settings.SPECULATION_MIN_CHARS:
+            return
+        if self.speculation is not None:
+            if self.speculation.query == query:
+                return
+            # The transcript moved on, the older guess is wasted
+            turn, self.speculation = self.speculation, None
+            await self._discard(turn)
+        elif not self.scheduler.idle:
+            return
+        fork_id = await self.pipeline.fork_session()
+        trace = TurnTrace(query=query)
+        trace.mark("agent_start")
+        # The turn's task inherits the trace for its tool calls
+        token = current_trace.set(trace)
+        try:
+            self.speculation = SpeculativeTurn(
+                query=query,
+                events=self.pipeline.call_agent(
+                    query=query, run_config=self._run_config(), session_id=fork_id
+                ),
+                limiter=get_llm_limiter(),
+                trace=trace,
+                session_id=fork_id,
+            )
+        finally:
+            current_trace.reset(token)
+        self.speculation_stats.record_started()
+
+    # Stop the speculative turn and drop its fork, the session never sees its events
+    async def _discard(self, turn: SpeculativeTurn):
+        await turn.close()
+        await self.pipeline.drop_fork(turn.session_id)
+        self.speculation_stats.record_discarded(turn)
+
+    # Commit the speculative turn if the final transcript matches its query
+    # Returns the trace of the turn to run for the final transcript
+    async def _settle_speculation(self, full_sentence: str):
+        trace = TurnTrace(query=full_sentence)
+        turn, self.speculation = self.speculation, None
+        if turn is None:
+            return trace
+        similarity = transcript_similarity(turn.query, full_sentence)
+        if similarity >= self.settings.SPECULATION_SIMILARITY:
+            turn.commit()
+            if self.committed is not None:
+                await self._discard(self.committed[1])
+            # The committed turn keeps the trace its tool calls were made with
+            trace = turn.trace
+            trace.query = full_sentence
+            self.committed = (trace, turn)
+        else:
+            await self._discard(turn)
+        await self.message_queue.put(
+            (
+                "speculation",
+                {
+                    "committed": turn.committed_at is not None,
+                    "similarity": round(similarity, 3),
+                    **self.speculation_stats.report(),
+                },
+            )
+        )
+        return trace
+
+    # Take the speculative turn committed for the turn
+    async def _take_committed(self, trace: TurnTrace):
+        committed, self.committed = self.committed, None
+        if committed is None:
+            return None
+        committed_trace, turn = committed
+        if committed_trace is trace:
+            return turn
+        # Superseded before its turn ran
+        await self._discard(turn)
+        return None
+
+    def _run_config(self):
+        if self.settings.TTS_STREAMING:
+            return RunConfig(streaming_mode=StreamingMode.SSE)
+        return None
+
+    async def on_error(self, error: str):
+        # Adding the errors if there are any
+        await self.message_queue.put(("error", error))
+
+    # Run the agent on the user's sentence and speak its response
+    async def respond(self, trace: TurnTrace):
+        # The turn runs in its own task, its tool calls pick up the trace
+        current_trace.set(trace)
+        speech = self.audio_output.new_turn(turn_start=time.perf_counter())
+        splitter = SentenceSplitter(min_chars=self.settings.TTS_MIN_SEGMENT_CHARS)
+        speculative = await self._take_committed(trace)
+        try:
+            if speculative is not None:
+                # The speculative turn already holds its llm slot
+                await self._run_agent_turn(
+                    speculative.events(), speech, splitter, trace
+                )
+                # The session gets the turn's events with the final transcript
+                await self.pipeline.adopt_fork(speculative.session_id, trace.query)
+            else:
+                # The slot is released once the llm is done, not after the playback
+                async with get_llm_limiter():
+                    trace.mark("agent_start")
+                    events = self.pipeline.call_agent(
+                        query=trace.query, run_config=self._run_config()
+                    )
+                    await self._run_agent_turn(events, speech, splitter, trace)
+        except asyncio.CancelledError:
+            # A superseded turn must not keep speaking
+            await self._abort(speech, speculative)
+            raise
+        except Exception as e:
+            # A failed turn stops its speech too, the turns chained after it
+            # wait on its playback
+            await self._abort(speech, speculative)
+            await self.message_queue.put(("error", f"Agent turn failed: {e}"))
+            raise
+        metrics = await speech.finish()
+        for error in speech.errors:
+            await self.message_queue.put(("error", error))
+        if speculative is not None:
+            self.speculation_stats.record_committed(speculative)
+            metrics["speculation_saved_ms"] = round(speculative.saved_seconds * 1000, 2)
+        # Adding the time to first audio of the turn to the message queue
+        await self.message_queue.put(("metrics", metrics))
+        trace.mark("playback_end")
+        if speech.first_audio_at is not None:
+            # The speech times are on the performance counter
+            trace.mark(
+                "first_audio",
+                at=time.time() - (time.perf_counter() - speech.first_audio_at),
+            )
+        # Adding the per stage latency of the turn to the message queue
+        breakdown = trace.breakdown()
+        log_span(breakdown)
+        await self.message_queue.put(("turn_breakdown", breakdown))
+
+    # Stop the speech of a turn that didn't complete and drop its speculative turn
+    async def _abort(self, speech: SpeechPipeline, speculative: SpeculativeTurn | None):
+        speech.cancel()
+        if speculative is not None:
+            await self._discard(speculative)
+
+    # Stream the agent events of the turn into the message queue and the speech
+    async def _run_agent_turn(self, events, speech, splitter, trace: TurnTrace):
+        streamed = False
+        async for event in events:
+            if isinstance(event, str):
+                # The agent stopped running
+                await self.message_queue.put(("error", event))
+            elif event.get_function_calls():
+                tool_name = event.content.parts[0].function_call.name
+                args_passed = (event.content.parts[0].function_call.args or {}).get(
+                    "query"
+                )
+                for function_call in event.get_function_calls():
+                    trace.tool_started(function_call.name)
+
+                agent_response = (
+                    f"Calling tool {tool_name} with query {args_passed} Please Hold On!"
+                )
+                # Adding the agent doing tool call in the message queue
+                await self.message_queue.put(("agent", agent_response))
+                # A fixed filler phrase intimates the user about the tool call, it is
+                # pre-rendered and served from the tts cache
+                speech.say(self.settings.TOOL_CALL_FILLER)
+            elif event.get_function_responses():
+                for function_response in event.get_function_responses():
+                    trace.tool_finished(function_response.name)
+            elif event.partial:
+                # Speak every sentence as soon as the llm has generated it
+                parts = event.content.parts if event.content else None
+                text = "".join(part.text or "" for part in parts or [])
+                streamed = streamed or bool(text)
+                for segment in splitter.feed(text):
+                    speech.say(segment)
+            elif event.is_final_response():
+                trace.mark("final_response")
+                agent_response = event.content.parts[0].text
+                # Adding the agent response to the message queue
+                await self.message_queue.put(("agent", agent_response))
+                # Converting the agent response back to audio using elevenlabs
+                # A streamed response has already been spoken up to its last segment
+                remainder = splitter.flush() if streamed else agent_response
+                if remainder:
+                    speech.say(remainder)
+
+    # Stop the running turn and the speech
+    async def close(self):
+        turns = [self.speculation, self.committed and self.committed[1]]
+        self.speculation = self.committed = None
+        for turn in turns:
+            if turn:
+                await self._discard(turn)
+        await self.scheduler.close()
+        await self.audio_output.close()
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Literal
+from app.config.settings import get_settings
+
+# Limit on the llm turns running at the same time across every session
+_llm_limiter: asyncio.Semaphore | None = None
+
+
+# Initalizing the global llm concurrency limit
+def get_llm_limiter():
+    global _llm_limiter
+    if _llm_limiter is None:
+        _llm_limiter = asyncio.Semaphore(get_settings().MAX_CONCURRENT_LLM_CALLS)
+    return _llm_limiter
+
+
+# Per session work queue between the transcription and the agent
+# The turns take a slot of the llm limiter themselves, only while the llm is generating
+# With the supersede policy a new user sentence cancels the turn still running
+# and drops the ones waiting, with the queue policy every sentence gets its turn
+class TurnScheduler:
+    def __init__(
+        self,
+        run_turn: Callable[[Any], Awaitable[None]],
+        policy: Literal["supersede", "queue"],
+    ):
+        self.run_turn = run_turn
+        self.policy = policy
+        self.started = 0
+        self.completed = 0
+        self.superseded = 0
+        self._pending: asyncio.Queue = asyncio.Queue()
+        self._current: asyncio.Task | None = None
+        self._worker = asyncio.create_task(self._work())
+
+    # Schedule a turn for the user's sentence, returns the number of turns it superseded
+    def submit(self, turn: Any):
+        superseded = 0
+        if self.policy == "supersede":
+            while not self._pending.empty():
+                self._pending.get_nowait()
+                superseded += 1
+            current = self._current
+            if current is not None and not current.done() and not current.cancelling():
+                current.cancel()
+                superseded += 1
+        self.superseded += superseded
+        self._pending.put_nowait(turn)
+        return superseded
+
+    # No turn is running or waiting
+    @property
+    def idle(self):
+        current = self._current
+        return self._pending.empty() and (current is None or current.done())
+
+    async def _run(self, turn: Any):
+        self.started += 1
+        await self.run_turn(turn)
+        self.completed += 1
+
+    async def _work(self):
+        while True:
+            turn = await self._pending.get()
+            self._current = asyncio.create_task(self._run(turn))
+            # A superseded turn is cancelled, that must not stop the worker
+            await asyncio.wait([self._current])
+            if not self._current.cancelled() and self._current.exception():
+                print(f"Agent turn failed: {self._current.exception()}")
+
+    def stats(self):
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "superseded": self.superseded,
+        }
+
+    # Cancel the running turn and stop the worker
+    async def close(self):
+        tasks = [self._worker]
+        if self._current is not None:
+            tasks.append(self._current)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
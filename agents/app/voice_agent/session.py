@@ -0,0 +1,201 @@
+import time
+import uuid
+from collections import OrderedDict
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService
+from google.genai import types
+
+
+# To collect all the transcriptions parts to get the full sentence
+class TranscriptCollector:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transcript_parts = []
+
+    def add_part(self, part):
+        self.transcript_parts.append(part)
+
+    def get_full_transcript(self):
+        return " ".join(self.transcript_parts)
+
+
+# Everything a single caller's conversation needs, built once per session
+class SessionPipeline:
+    def __init__(
+        self,
+        agent: BaseAgent,
+        app_name: str,
+        session_service: BaseSessionService,
+        session_id: str,
+        user_id: str,
+    ):
+        self.app_name = app_name
+        self.session_service = session_service
+        self.session_id = session_id
+        self.user_id = user_id
+        self.runner = Runner(
+            agent=agent, app_name=app_name, session_service=session_service
+        )
+        # Number of open streams using the pipeline, active pipelines are never evicted
+        self.connections = 0
+        self.last_active = time.monotonic()
+        self._session_ready = False
+        # Number of events every fork copied from the session, by fork session id
+        self._forks: dict[str, int] = {}
+
+    # Get the current session if exists or create a new session
+    async def _ensure_session(self):
+        if self._session_ready:
+            return
+        current_session = await self.session_service.get_session(
+            app_name=self.app_name, user_id=self.user_id, session_id=self.session_id
+        )
+        if not current_session:
+            await self.session_service.create_session(
+                app_name=self.app_name, user_id=self.user_id, session_id=self.session_id
+            )
+        self._session_ready = True
+
+    async def _get_session(self, session_id: str):
+        return await self.session_service.get_session(
+            app_name=self.app_name, user_id=self.user_id, session_id=session_id
+        )
+
+    # Copy the session for a speculative turn, its events stay out of the session
+    # until the turn is committed, returns the id of the copy
+    async def fork_session(self):
+        await self._ensure_session()
+        session = await self._get_session(self.session_id)
+        fork = await self.session_service.create_session(
+            app_name=self.app_name,
+            user_id=self.user_id,
+            state=dict(session.state),
+            session_id=f"{self.session_id}-speculation-{uuid.uuid4().hex}",
+        )
+        for event in session.events:
+            await self.session_service.append_event(fork, event.model_copy(deep=True))
+        self._forks[fork.id] = len(session.events)
+        return fork.id
+
+    # Append the events of a committed speculative turn to the session and drop the fork
+    # The turn was started on the interim transcript, the final one replaces its user message
+    async def adopt_fork(self, fork_id: str, query: str):
+        fork = await self._get_session(fork_id)
+        session = await self._get_session(self.session_id)
+        replaced = False
+        for event in fork.events[self._forks.get(fork_id, 0) :]:
+            event = event.model_copy(deep=True)
+            if not replaced and event.author == "user":
+                event.content = types.Content(
+                    role="user", parts=[types.Part(text=query)]
+                )
+                replaced = True
+            await self.session_service.append_event(session, event)
+        await self.drop_fork(fork_id)
+
+    async def drop_fork(self, fork_id: str):
+        self._forks.pop(fork_id, None)
+        await self.session_service.delete_session(
+            app_name=self.app_name, user_id=self.user_id, session_id=fork_id
+        )
+
+    # Agent Interaction, on the session or on one of its forks
+    async def call_agent(
+        self, query: str, run_config=None, session_id: str | None = None
+    ):
+        self.last_active = time.monotonic()
+        await self._ensure_session()
+        try:
+            content = types.Content(role="user", parts=[types.Part(text=query)])
+            events = self.runner.run_async(
+                user_id=self.user_id,
+                session_id=session_id or self.session_id,
+                new_message=content,
+                run_config=run_config,
+            )
+            async for event in events:
+                yield event
+        except Exception as e:
+            yield f"Agent Stopped Running {e}"
+        finally:
+            self.last_active = time.monotonic()
+
+
+# Keeps the session pipelines alive between utterances
+# Idle pipelines expire after idle_timeout seconds and the least recently
+# used inactive pipeline is evicted once there are more than max_sessions
+class SessionRegistry:
+    def __init__(
+        self,
+        agent: BaseAgent,
+        app_name: str,
+        session_service: BaseSessionService,
+        max_sessions: int,
+        idle_timeout: float,
+    ):
+        self.agent = agent
+        self.app_name = app_name
+        self.session_service = session_service
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._pipelines: OrderedDict[tuple[str, str], SessionPipeline] = OrderedDict()
+
+    # Get the pipeline of the session, creating it on first use
+    async def get(self, session_id: str, user_id: str):
+        await self._evict()
+        key = (user_id, session_id)
+        pipeline = self._pipelines.get(key)
+        if pipeline is None:
+            pipeline = SessionPipeline(
+                agent=self.agent,
+                app_name=self.app_name,
+                session_service=self.session_service,
+                session_id=session_id,
+                user_id=user_id,
+            )
+            self._pipelines[key] = pipeline
+        self._pipelines.move_to_end(key)
+        pipeline.last_active = time.monotonic()
+        return pipeline
+
+    # Get the pipeline for an open stream, it stays pinned until released
+    async def acquire(self, session_id: str, user_id: str):
+        pipeline = await self.get(session_id, user_id)
+        pipeline.connections += 1
+        return pipeline
+
+    # Release the pipeline once its stream is closed
+    def release(self, pipeline: SessionPipeline):
+        pipeline.connections = max(0, pipeline.connections - 1)
+        pipeline.last_active = time.monotonic()
+
+    # Drop the expired pipelines and the least recently used ones over capacity
+    # together with their adk sessions, the session service would keep them forever
+    async def _evict(self):
+        now = time.monotonic()
+        evicted = []
+        for key, pipeline in list(self._pipelines.items()):
+            if (
+                pipeline.connections == 0
+                and now - pipeline.last_active > self.idle_timeout
+            ):
+                evicted.append(self._pipelines.pop(key))
+        for key, pipeline in list(self._pipelines.items()):
+            if len(self._pipelines) < self.max_sessions:
+                break
+            if pipeline.connections == 0:
+                evicted.append(self._pipelines.pop(key))
+        # Removed from the registry before awaiting so no caller picks them up
+        for pipeline in evicted:
+            pipeline._session_ready = False
+            await self.session_service.delete_session(
+                app_name=self.app_name,
+                user_id=pipeline.user_id,
+                session_id=pipeline.session_id,
+            )
+
+    def __len__(self):
+        return len(self._pipelines)
@@ -0,0 +1,125 @@
+import asyncio
+import difflib
+import re
+import time
+from typing import AsyncIterator
+
+_WORD = re.compile(r"\w+")
+
+# Marks the end of the held events
+_DONE = object()
+
+
+# Similarity of two transcripts ignoring case and punctuation
+def transcript_similarity(first: str, second: str) -> float:
+    first_words = _WORD.findall(first.lower())
+    second_words = _WORD.findall(second.lower())
+    if not first_words and not second_words:
+        return 1.0
+    return difflib.SequenceMatcher(None, first_words, second_words).ratio()
+
+
+# Agent turn started on an interim transcript, on a fork of the session
+# Its events are held back until the final transcript commits or discards the turn
+class SpeculativeTurn:
+    def __init__(
+        self,
+        query: str,
+        events: AsyncIterator,
+        limiter: asyncio.Semaphore,
+        trace=None,
+        session_id: str | None = None,
+    ):
+        self.query = query
+        # Fork of the session the turn runs on
+        self.session_id = session_id
+        # Trace the turn's tool calls are made with, kept once it is committed
+        self.trace = trace
+        self.started_at = time.perf_counter()
+        self.committed_at: float | None = None
+        self.finished_at: float | None = None
+        # Completed llm responses and tool calls, wasted if the turn is discarded
+        self.llm_responses = 0
+        self.tool_calls = 0
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(events, limiter))
+
+    async def _run(self, events: AsyncIterator, limiter: asyncio.Semaphore):
+        try:
+            async with limiter:
+                async for event in events:
+                    if (
+                        not isinstance(event, str)
+                        and not event.partial
+                        and event.content
+                        and event.content.role == "model"
+                    ):
+                        self.llm_responses += 1
+                        self.tool_calls += len(event.get_function_calls())
+                    self._events.put_nowait(event)
+        finally:
+            self.finished_at = time.perf_counter()
+            self._events.put_nowait(_DONE)
+
+    # The final transcript matched, the held events can be used
+    def commit(self):
+        self.committed_at = time.perf_counter()
+
+    # Replay the held events, then the ones still being generated
+    async def events(self):
+        while (event := await self._events.get()) is not _DONE:
+            yield event
+
+    # Head start the turn had on the final transcript
+    @property
+    def saved_seconds(self):
+        if self.committed_at is None:
+            return 0.0
+        end = min(self.committed_at, self.finished_at or self.committed_at)
+        return max(0.0, end - self.started_at)
+
+    # Stop the turn and wait until it has stopped
+    async def close(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+# Latency saved by the committed speculative turns against the work of the discarded ones
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.committed = 0
+        self.discarded = 0
+        self.wasted_llm_responses = 0
+        self.wasted_tool_calls = 0
+        self.saved_ms: list[float] = []
+
+    def record_started(self):
+        self.started += 1
+
+    def record_discarded(self, turn: SpeculativeTurn):
+        self.discarded += 1
+        self.wasted_llm_responses += turn.llm_responses
+        self.wasted_tool_calls += turn.tool_calls
+
+    def record_committed(self, turn: SpeculativeTurn):
+        self.committed += 1
+        self.saved_ms.append(turn.saved_seconds * 1000)
+
+    def report(self):
+        decided = self.committed + self.discarded
+        return {
+            "started": self.started,
+            "committed": self.committed,
+            "discarded": self.discarded,
+            "hit_rate": round(self.committed / decided, 3) if decided else None,
+            "saved_ms_total": round(sum(self.saved_ms), 2),
+            "saved_ms_mean": (
+                round(sum(self.saved_ms) / len(self.saved_ms), 2)
+                if self.saved_ms
+                else None
+            ),
+            "wasted_turns": self.discarded,
+            "wasted_llm_responses": self.wasted_llm_responses,
+            "wasted_tool_calls": self.wasted_tool_calls,
+        }
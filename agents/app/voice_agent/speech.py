@@ -0,0 +1,177 @@
+import asyncio
+import re
+import time
+from typing import Callable
+from app.voice_agent.audio import AudioSink
+
+# Sentence or clause boundary followed by whitespace
+_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+# Split the streamed llm text into sentences and clauses as soon as they are complete
+class SentenceSplitter:
+    def __init__(self, min_chars: int):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    # Add streamed text, returns the segments completed by it
+    def feed(self, text: str):
+        self._buffer += text
+        segments = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._buffer):
+            # Very short clauses are merged into the next one to avoid choppy audio
+            if match.start() - start >= self.min_chars:
+                segments.append(self._buffer[start : match.start()].strip())
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return [segment for segment in segments if segment]
+
+    # Return whatever is left once the response is complete
+    def flush(self):
+        segment, self._buffer = self._buffer.strip(), ""
+        return segment or None
+
+
+# Synthesizes the segments of one turn while the earlier ones are playing
+# A turn starts playing once the previous turn has finished or was interrupted
+class SpeechPipeline:
+    def __init__(
+        self,
+        synthesize: Callable[[str], bytes],
+        sink: AudioSink,
+        turn_start: float | None = None,
+        previous: "SpeechPipeline | None" = None,
+    ):
+        self.synthesize = synthesize
+        self.sink = sink
+        self.turn_start = turn_start or time.perf_counter()
+        self.previous = previous
+        self.first_audio_at: float | None = None
+        self.segments = 0
+        self.interrupted = False
+        # Failed segments are skipped, the errors are reported with the turn
+        self.errors: list[str] = []
+        self._texts: asyncio.Queue[str | None] = asyncio.Queue()
+        # Only the next segment is synthesized ahead of playback
+        self._audio: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=1)
+        self._tasks = [
+            asyncio.create_task(self._synthesize_loop()),
+            asyncio.create_task(self._play_loop()),
+        ]
+        for task in self._tasks:
+            task.add_done_callback(self._observe)
+
+    # Record the error of a loop that died so it is reported instead of lost
+    def _observe(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.errors.append(f"Speech stopped: {task.exception()}")
+
+    async def _synthesize_loop(self):
+        try:
+            while (text := await self._texts.get()) is not None:
+                try:
+                    audio = await asyncio.to_thread(self.synthesize, text)
+                except Exception as e:
+                    self.errors.append(f"Speech synthesis failed: {e}")
+                    print(f"Speech synthesis failed for {text!r}: {e}")
+                    continue
+                await self._audio.put(audio)
+        finally:
+            # The playback always ends, the turns chained after it are waiting on it
+            if not self.interrupted:
+                await self._audio.put(None)
+
+    async def _play_loop(self):
+        if self.previous is not None:
+            await self.previous.wait_played()
+            self.previous = None
+        while (audio := await self._audio.get()) is not None:
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            try:
+                await self.sink.play(audio)
+            except Exception as e:
+                # Keep draining so the synthesis never blocks on a full queue
+                self.errors.append(f"Audio playback failed: {e}")
+                print(f"Audio playback failed: {e}")
+
+    # Queue a segment for synthesis
+    def say(self, text: str):
+        if self.interrupted:
+            return
+        self.segments += 1
+        self._texts.put_nowait(text)
+
+    # Whether the turn still has audio to synthesize or play
+    @property
+    def active(self):
+        return not all(task.done() for task in self._tasks)
+
+    # Wait until the turn's audio is played or interrupted
+    async def wait_played(self):
+        await asyncio.wait(self._tasks)
+
+    # Stop the playback and drop every queued segment
+    def cancel(self):
+        self.interrupted = True
+        for task in self._tasks:
+            task.cancel()
+
+    # Wait until every queued segment is played, returns the turn metrics
+    async def finish(self):
+        self._texts.put_nowait(None)
+        await self.wait_played()
+        return self.metrics()
+
+    def metrics(self):
+        return {
+            "segments": self.segments,
+            "time_to_first_audio_ms": (
+                round((self.first_audio_at - self.turn_start) * 1000, 1)
+                if self.first_audio_at is not None
+                else None
+            ),
+            "turn_ms": round((time.perf_counter() - self.turn_start) * 1000, 1),
+            "interrupted": self.interrupted,
+            "errors": len(self.errors),
+        }
+
+
+# Audio output of one conversation, plays the turns one after another
+class AudioOutput:
+    def __init__(self, synthesize: Callable[[str], bytes], sink: AudioSink):
+        self.synthesize = synthesize
+        self.sink = sink
+        self._turns: list[SpeechPipeline] = []
+
+    # Start the speech of a new turn, it plays after the turns already queued
+    def new_turn(self, turn_start: float | None = None):
+        self._turns = [turn for turn in self._turns if turn.active]
+        speech = SpeechPipeline(
+            synthesize=self.synthesize,
+            sink=self.sink,
+            turn_start=turn_start,
+            previous=self._turns[-1] if self._turns else None,
+        )
+        self._turns.append(speech)
+        return speech
+
+    # Whether any audio is playing or waiting to be played
+    @property
+    def speaking(self):
+        return any(turn.active for turn in self._turns)
+
+    # Barge-in: stop the current speech and drop the queued turns
+    def interrupt(self):
+        interrupted = [turn for turn in self._turns if turn.active]
+        for turn in interrupted:
+            turn.cancel()
+        self._turns = []
+        if interrupted:
+            self.sink.interrupt()
+        return len(interrupted)
+
+    async def close(self):
+        self.interrupt()
+        await self.sink.close()
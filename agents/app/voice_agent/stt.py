@@ -0,0 +1,161 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
+from deepgram import (
+    DeepgramClient,
+    DeepgramClientOptions,
+    LiveTranscriptionEvents,
+    LiveOptions,
+)
+from app.config.settings import get_settings
+from app.voice_agent.vad import EnergyVAD
+
+# Called with the transcript and whether the speaker finished the sentence
+TranscriptHandler = Callable[[str, bool], Awaitable[None]]
+ErrorHandler = Callable[[str], Awaitable[None]]
+
+
+# Speech to text backend receiving 16 kHz mono linear16 audio frames
+class STTBackend(ABC):
+    @abstractmethod
+    async def start(self, on_transcript: TranscriptHandler, on_error: ErrorHandler):
+        pass
+
+    # Send one audio frame, any bytes-like object is accepted without copying it
+    @abstractmethod
+    async def send(self, frame: bytes | memoryview):
+        pass
+
+    # Flush the transcript of the audio sent so far as the end of the utterance
+    async def finalize(self):
+        pass
+
+    @abstractmethod
+    async def finish(self):
+        pass
+
+
+# Deepgram live transcription
+class DeepgramSTT(STTBackend):
+    def __init__(self):
+        config = DeepgramClientOptions(options={"keepalive": "true"})
+        deepgram: DeepgramClient = DeepgramClient(
+            api_key=get_settings().DEEPGRAM_API_KEY, config=config
+        )
+        self.dg_connection = deepgram.listen.asynclive.v("1")
+
+    async def start(self, on_transcript: TranscriptHandler, on_error: ErrorHandler):
+        async def on_message(self, result, **kwargs):
+            sentence = result.channel.alternatives[0].transcript
+            # A finalize request ends the utterance like the remote endpointing
+            speech_final = result.speech_final or bool(result.from_finalize)
+            await on_transcript(sentence, speech_final)
+
+        async def on_dg_error(self, error, **kwargs):
+            await on_error(str(error))
+
+        self.dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
+        self.dg_connection.on(LiveTranscriptionEvents.Error, on_dg_error)
+
+        options = LiveOptions(
+            model="nova-2",
+            punctuate=True,
+            language="en-US",
+            encoding="linear16",
+            channels=1,
+            sample_rate=16000,
+            endpointing=True,
+        )
+        await self.dg_connection.start(options)
+
+    async def send(self, frame: bytes | memoryview):
+        await self.dg_connection.send(frame)
+
+    async def finalize(self):
+        await self.dg_connection.finalize()
+
+    async def finish(self):
+        # Send a closestream to deepgram and finish
+        await self.dg_connection.send(json.dumps({"type": "CloseStream"}))
+        await self.dg_connection.finish()
+
+
+# Speech to text stand-in for local runs and benchmarks, no audio is transcribed
+# Every finalized utterance is transcribed as the fixed transcript, with the VAD
+# enabled that is every utterance of the caller, say() transcribes any sentence
+class FakeSTT(STTBackend):
+    def __init__(self, delay: float = 0.0, transcript: str = ""):
+        self.delay = delay
+        self.transcript = transcript
+        self.bytes_received = 0
+        self._utterance_bytes = 0
+        self._on_transcript: TranscriptHandler | None = None
+
+    async def start(self, on_transcript: TranscriptHandler, on_error: ErrorHandler):
+        self._on_transcript = on_transcript
+
+    async def send(self, frame: bytes | memoryview):
+        self.bytes_received += len(frame)
+        self._utterance_bytes += len(frame)
+
+    # The caller said the sentence, it is the final transcript after the delay
+    async def say(self, sentence: str):
+        await asyncio.sleep(self.delay)
+        await self._on_transcript(sentence, True)
+
+    async def finalize(self):
+        if self._utterance_bytes and self.transcript:
+            self._utterance_bytes = 0
+            await self.say(self.transcript)
+
+    async def finish(self):
+        self._on_transcript = None
+
+
+# Speech to text backend only receiving the voiced frames
+# The local end of utterance finalizes the backend's transcript instead of waiting
+# for its own endpointing
+class VADSTT(STTBackend):
+    def __init__(self, backend: STTBackend, vad: EnergyVAD):
+        self.backend = backend
+        self.vad = vad
+
+    async def start(self, on_transcript: TranscriptHandler, on_error: ErrorHandler):
+        await self.backend.start(on_transcript=on_transcript, on_error=on_error)
+
+    async def send(self, frame: bytes | memoryview):
+        frames, ended = self.vad.process(frame)
+        for voiced in frames:
+            await self.backend.send(voiced)
+        if ended:
+            await self.backend.finalize()
+
+    async def finalize(self):
+        await self.backend.finalize()
+
+    async def finish(self):
+        await self.backend.finish()
+
+
+# Wrap the backend with the voice activity detection when it is enabled
+def with_vad(backend: STTBackend) -> STTBackend:
+    settings = get_settings()
+    if not settings.VAD_ENABLED:
+        return backend
+    vad = EnergyVAD(
+        threshold=settings.VAD_THRESHOLD,
+        hangover_ms=settings.VAD_HANGOVER_MS,
+        pre_roll_ms=settings.VAD_PRE_ROLL_MS,
+    )
+    return VADSTT(backend=backend, vad=vad)
+
+
+# Create the configured speech to text backend
+def create_stt_backend():
+    backend = get_settings().STT_BACKEND
+    if backend == "deepgram":
+        return with_vad(DeepgramSTT())
+    if backend == "fake":
+        return with_vad(FakeSTT(transcript=get_settings().FAKE_STT_TRANSCRIPT))
+    raise ValueError(f"Invalid speech to text backend: {backend}")
@@ -0,0 +1,134 @@
+import json
+import secrets
+import time
+from contextvars import ContextVar
+from mcp import types
+from google.adk.tools.mcp_tool.mcp_session_manager import retry_on_closed_resource
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset
+from app.config.settings import get_settings
+from app.utils.metrics import Histogram
+
+# Latency of every stage of the voice turns
+turn_stage_latency = Histogram(
+    "voice_turn_stage_duration_seconds",
+    "Latency of the stages of a voice turn",
+    label_names=("stage",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0),
+)
+
+# Stages of the turn breakdown as the marks they run between
+STAGES = (
+    ("queue", "stt_final", "agent_start"),
+    ("agent", "agent_start", "final_response"),
+    ("time_to_first_audio", "stt_final", "first_audio"),
+    ("playback", "first_audio", "playback_end"),
+    ("total", "stt_final", "playback_end"),
+)
+
+# Trace of the turn running in the current task, read by the tool calls
+current_trace: ContextVar["TurnTrace | None"] = ContextVar(
+    "current_trace", default=None
+)
+
+
+# Timing of one voice turn, from the final transcript to the end of the playback
+# The trace id is passed on to the tools service and from there to the ingestion service
+class TurnTrace:
+    def __init__(self, query: str):
+        self.query = query
+        self.trace_id = secrets.token_hex(16)
+        self.marks: dict[str, float] = {}
+        # Name, start and end of every tool call
+        self.tool_calls: list[list] = []
+
+    # Record when a stage boundary was reached, the first time counts
+    def mark(self, name: str, at: float | None = None):
+        self.marks.setdefault(name, at if at is not None else time.time())
+
+    # The agent events carry the time they were created, not when they completed,
+    # so the tool calls are timed when the turn receives their events
+    def tool_started(self, name: str):
+        self.tool_calls.append([name, time.time(), None])
+
+    def tool_finished(self, name: str):
+        for call in self.tool_calls:
+            if call[0] == name and call[2] is None:
+                call[2] = time.time()
+                return
+
+    # W3C trace context header of a new span of the trace
+    def traceparent(self):
+        return f"00-{self.trace_id}-{secrets.token_hex(8)}-01"
+
+    # Milliseconds spent in every stage, recorded in the stage histograms
+    def breakdown(self):
+        stages = {}
+        for stage, start, end in STAGES:
+            if start in self.marks and end in self.marks:
+                # A speculative turn starts before the final transcript
+                stages[stage] = max(0.0, self.marks[end] - self.marks[start])
+        tools = [end - start for _, start, end in self.tool_calls if end is not None]
+        if tools:
+            stages["tools"] = sum(tools)
+        for stage, seconds in stages.items():
+            turn_stage_latency.observe(seconds, stage=stage)
+        return {
+            "trace_id": self.trace_id,
+            "stages_ms": {
+                stage: round(seconds * 1000, 1) for stage, seconds in stages.items()
+            },
+            "tool_calls": [
+                {
+                    "tool": name,
+                    "ms": round((end - start) * 1000, 1) if end is not None else None,
+                }
+                for name, start, end in self.tool_calls
+            ],
+        }
+
+
+# Log the turn breakdown as the root span of its trace, the tools and ingestion
+# services log the retrieval spans of the turn with the same trace id
+def log_span(breakdown: dict):
+    if get_settings().LOG_TRACE_SPANS:
+        print(json.dumps({"service": "agents", "span": "voice_turn", **breakdown}))
+
+
+# Mcp tool sending the trace context of the running turn in the request's _meta
+# ClientSession.call_tool of the locked mcp has no meta argument, so the tools/call
+# request is built here and sent with send_request, which also works on newer mcp
+# adk has no hook for the call's _meta, this overrides the private _run_async_impl
+# and uses _get_headers, _mcp_session_manager and _auth_scheme of McpTool and
+# MCPToolset, which is why google-adk is pinned to the exact version they were
+# written against, check them before upgrading it
+class TracedMcpTool(McpTool):
+    @retry_on_closed_resource
+    async def _run_async_impl(self, *, args, tool_context, credential):
+        headers = await self._get_headers(tool_context, credential)
+        session = await self._mcp_session_manager.create_session(headers=headers)
+        trace = current_trace.get()
+        meta = {"traceparent": trace.traceparent()} if trace is not None else None
+        request = types.CallToolRequest(
+            params=types.CallToolRequestParams(
+                name=self.name, arguments=args, _meta=meta
+            ),
+        )
+        return await session.send_request(
+            types.ClientRequest(request), types.CallToolResult
+        )
+
+
+# Toolset of traced mcp tools
+# Per call headers would open an mcp session per trace, the _meta field doesn't
+class TracedMCPToolset(MCPToolset):
+    async def get_tools(self, readonly_context=None):
+        return [
+            TracedMcpTool(
+                mcp_tool=tool._mcp_tool,
+                mcp_session_manager=tool._mcp_session_manager,
+                auth_scheme=self._auth_scheme,
+                auth_credential=self._auth_credential,
+            )
+            for tool in await super().get_tools(readonly_context)
+        ]
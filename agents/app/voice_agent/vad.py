@@ -0,0 +1,80 @@
+import math
+from collections import deque
+
+
+# Energy based voice activity detection on 16 kHz mono linear16 frames
+# Silence frames are dropped, the speech frames are kept with a short pre-roll so the
+# first syllable isn't cut, the utterance ends after hangover_ms of silence
+class EnergyVAD:
+    def __init__(
+        self,
+        threshold: float,
+        hangover_ms: float,
+        pre_roll_ms: float,
+        sample_rate: int = 16000,
+    ):
+        self.threshold = threshold
+        self.hangover_ms = hangover_ms
+        self.pre_roll_ms = pre_roll_ms
+        self.sample_rate = sample_rate
+        self.speaking = False
+        self._silence_ms = 0.0
+        self._pre_roll: deque = deque()
+        self._pre_roll_duration = 0.0
+        self.frames_in = 0
+        self.frames_sent = 0
+        self.bytes_dropped = 0
+        self.utterances = 0
+
+    # Duration of a frame in milliseconds
+    def _duration_ms(self, frame) -> float:
+        return len(frame) / 2 / self.sample_rate * 1000
+
+    # Root mean square amplitude of the frame, read in place
+    def energy(self, frame) -> float:
+        view = memoryview(frame)
+        if len(view) < 2:
+            return 0.0
+        samples = view[: len(view) - len(view) % 2].cast("h")
+        return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+    # Returns the frames to send upstream and whether the utterance just ended
+    def process(self, frame) -> tuple[list, bool]:
+        self.frames_in += 1
+        duration = self._duration_ms(frame)
+        voiced = self.energy(frame) >= self.threshold
+
+        if not self.speaking:
+            if not voiced:
+                # Keep the latest silence as pre-roll for the next utterance
+                self._pre_roll.append((frame, duration))
+                self._pre_roll_duration += duration
+                while self._pre_roll_duration > self.pre_roll_ms and self._pre_roll:
+                    dropped, dropped_duration = self._pre_roll.popleft()
+                    self._pre_roll_duration -= dropped_duration
+                    self.bytes_dropped += len(dropped)
+                return [], False
+            self.speaking = True
+            self._silence_ms = 0.0
+            frames = [pre_roll for pre_roll, _ in self._pre_roll] + [frame]
+            self._pre_roll.clear()
+            self._pre_roll_duration = 0.0
+            self.frames_sent += len(frames)
+            return frames, False
+
+        # The silence within the hangover is still sent, the speaker may continue
+        self._silence_ms = 0.0 if voiced else self._silence_ms + duration
+        self.frames_sent += 1
+        if self._silence_ms >= self.hangover_ms:
+            self.speaking = False
+            self.utterances += 1
+            return [frame], True
+        return [frame], False
+
+    def stats(self):
+        return {
+            "frames_in": self.frames_in,
+            "frames_sent": self.frames_sent,
+            "bytes_dropped": self.bytes_dropped,
+            "utterances": self.utterances,
+        }
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from google.adk.events import Event
+from google.genai import types
+from app.benchmark.stand_ins import STAND_IN_SETTINGS
+from app.config.settings import get_settings
+from app.voice_agent.audio import AudioSink
+from app.voice_agent.conversation import VoiceConversation
+
+
+# Records the played audio
+class RecordingSink(AudioSink):
+    def __init__(self):
+        self.played: list[bytes] = []
+
+    async def play(self, audio: bytes):
+        self.played.append(audio)
+
+
+# Session pipeline whose runner fails halfway through the "fail" turn
+class FailingPipeline:
+    async def call_agent(self, query: str, run_config=None, session_id=None):
+        if query == "fail":
+            yield Event(
+                author="agent",
+                partial=True,
+                content=types.Content(
+                    role="model", parts=[types.Part(text="Let me check that for you. ")]
+                ),
+            )
+            raise RuntimeError("runner failed")
+        yield Event(
+            author="agent",
+            content=types.Content(
+                role="model", parts=[types.Part(text=f"Answer to: {query}")]
+            ),
+        )
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    for name, value in STAND_IN_SETTINGS.items():
+        monkeypatch.setenv(name, value)
+    # Every turn gets to run and nothing interrupts the speech
+    monkeypatch.setenv("TURN_POLICY", "queue")
+    monkeypatch.setenv("BARGE_IN", "false")
+    monkeypatch.setenv("SPECULATIVE_TURNS", "false")
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+async def _wait_for(conversation: VoiceConversation, event_name: str):
+    while True:
+        name, payload = await conversation.message_queue.get()
+        if name == event_name:
+            return payload
+
+
+async def test_failed_turn_does_not_silence_the_next_one():
+    sink = RecordingSink()
+    conversation = VoiceConversation(
+        pipeline=FailingPipeline(), synthesize=str.encode, sink=sink
+    )
+    try:
+        await conversation.on_transcript("fail", True)
+        error = await asyncio.wait_for(_wait_for(conversation, "error"), timeout=2)
+        await conversation.on_transcript("next question", True)
+        await asyncio.wait_for(_wait_for(conversation, "metrics"), timeout=2)
+    finally:
+        await conversation.close()
+
+    assert "runner failed" in error
+    assert not conversation.audio_output.speaking
+    assert sink.played[-1] == b"Answer to: next question"
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from google.adk.agents.llm_agent import LlmAgent
+from google.adk.sessions import InMemorySessionService
+from app.benchmark.load_test import StubLlm
+from app.voice_agent.session import SessionPipeline
+from app.voice_agent.speculation import SpeculativeTurn, transcript_similarity
+
+
+@pytest.fixture
+def pipeline():
+    agent = LlmAgent(
+        model=StubLlm(model="stub", delay=0), name="test_agent", instruction="Answer"
+    )
+    return SessionPipeline(
+        agent=agent,
+        app_name="voice-agent-test",
+        session_service=InMemorySessionService(),
+        session_id="session",
+        user_id="user",
+    )
+
+
+async def _run(pipeline: SessionPipeline, query: str, session_id: str | None = None):
+    async for _ in pipeline.call_agent(query=query, session_id=session_id):
+        pass
+
+
+async def _history(pipeline: SessionPipeline, session_id: str = "session"):
+    session = await pipeline._get_session(session_id)
+    return [(event.author, event.content.parts[0].text) for event in session.events]
+
+
+async def test_speculative_turn_stays_out_of_the_session(pipeline):
+    await _run(pipeline, "first question")
+    fork_id = await pipeline.fork_session()
+
+    await _run(pipeline, "what about", session_id=fork_id)
+
+    assert await _history(pipeline) == [
+        ("user", "first question"),
+        ("test_agent", "Answer to: first question"),
+    ]
+    # The fork starts from the session's history
+    assert (await _history(pipeline, fork_id))[:2] == await _history(pipeline)
+
+    await pipeline.drop_fork(fork_id)
+    assert await pipeline._get_session(fork_id) is None
+
+
+async def test_committed_turn_records_the_final_transcript(pipeline):
+    fork_id = await pipeline.fork_session()
+    await _run(pipeline, "what does the guide", session_id=fork_id)
+
+    await pipeline.adopt_fork(fork_id, "what does the guide say")
+
+    assert await _history(pipeline) == [
+        ("user", "what does the guide say"),
+        ("test_agent", "Answer to: what does the guide"),
+    ]
+    assert await pipeline._get_session(fork_id) is None
+
+
+async def test_close_waits_for_the_cancelled_turn():
+    stopped = asyncio.Event()
+
+    async def events():
+        try:
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            stopped.set()
+
+    turn = SpeculativeTurn(
+        query="what does", events=events(), limiter=asyncio.Semaphore(1)
+    )
+    await asyncio.sleep(0)
+
+    await turn.close()
+
+    assert stopped.is_set()
+    assert turn.finished_at is not None
+
+
+def test_transcript_similarity_ignores_case_and_punctuation():
+    assert transcript_similarity("What does it say?", "what does it say") == 1.0
+    assert transcript_similarity("what does it say", "how much is it") < 0.5
@@ -0,0 +1,141 @@
+import asyncio
+import time
+import pytest
+from app.voice_agent.audio import AudioSink
+from app.voice_agent.speech import AudioOutput, SentenceSplitter
+
+
+# Records the played audio, play blocks while the gate is closed
+class FakeAudioSink(AudioSink):
+    def __init__(self):
+        self.played: list[bytes] = []
+        self.interrupts = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def play(self, audio: bytes):
+        await self.gate.wait()
+        self.played.append(audio)
+
+    def interrupt(self):
+        self.interrupts += 1
+
+
+# Synthesizes the text as its bytes, the later segments are faster so that
+# a pipeline reordering the segments would be caught
+def synthesize(text: str):
+    if text == "fail":
+        raise RuntimeError("tts unavailable")
+    time.sleep(0.02 if text.endswith("1") else 0.001)
+    return text.encode()
+
+
+@pytest.fixture
+def sink():
+    return FakeAudioSink()
+
+
+@pytest.fixture
+def output(sink):
+    return AudioOutput(synthesize=synthesize, sink=sink)
+
+
+async def test_segments_play_in_order(output, sink):
+    speech = output.new_turn()
+    for segment in ["segment 1", "segment 2", "segment 3"]:
+        speech.say(segment)
+
+    metrics = await asyncio.wait_for(speech.finish(), timeout=2)
+
+    assert sink.played == [b"segment 1", b"segment 2", b"segment 3"]
+    assert metrics["segments"] == 3
+    assert metrics["time_to_first_audio_ms"] is not None
+    assert not metrics["interrupted"]
+
+
+async def test_turn_plays_after_previous(output, sink):
+    sink.gate.clear()
+    first = output.new_turn()
+    second = output.new_turn()
+    second.say("second 1")
+    first.say("first 1")
+    first.say("first 2")
+    await asyncio.sleep(0.05)
+    sink.gate.set()
+
+    # The turns finish in any order, the second still plays last
+    await asyncio.wait_for(asyncio.gather(second.finish(), first.finish()), timeout=2)
+
+    assert sink.played == [b"first 1", b"first 2", b"second 1"]
+
+
+async def test_interrupt_cancels_current_and_queued_turns(output, sink):
+    sink.gate.clear()
+    current = output.new_turn()
+    queued = output.new_turn()
+    current.say("current 1")
+    queued.say("queued 1")
+    await asyncio.sleep(0.05)
+    assert output.speaking
+
+    assert output.interrupt() == 2
+
+    await asyncio.wait_for(current.wait_played(), timeout=2)
+    await asyncio.wait_for(queued.wait_played(), timeout=2)
+    sink.gate.set()
+    await asyncio.sleep(0)
+    assert sink.played == []
+    assert sink.interrupts == 1
+    assert current.interrupted and queued.interrupted
+    assert not output.speaking
+    # Segments of an interrupted turn are dropped
+    current.say("late")
+    assert current.segments == 1
+
+
+async def test_interrupt_without_speech_leaves_sink_alone(output, sink):
+    speech = output.new_turn()
+    await asyncio.wait_for(speech.finish(), timeout=2)
+
+    assert output.interrupt() == 0
+    assert sink.interrupts == 0
+
+
+async def test_failed_segment_is_skipped(output, sink):
+    first = output.new_turn()
+    second = output.new_turn()
+    first.say("before")
+    first.say("fail")
+    first.say("after")
+    second.say("next turn")
+
+    metrics = await asyncio.wait_for(first.finish(), timeout=2)
+    await asyncio.wait_for(second.finish(), timeout=2)
+
+    assert sink.played == [b"before", b"after", b"next turn"]
+    assert metrics["errors"] == 1
+    assert "tts unavailable" in first.errors[0]
+    assert second.errors == []
+
+
+async def test_failed_playback_does_not_block_the_turn(output, sink):
+    async def play(audio: bytes):
+        raise ConnectionResetError("caller hung up")
+
+    sink.play = play
+    speech = output.new_turn()
+    speech.say("first 1")
+    speech.say("second")
+
+    metrics = await asyncio.wait_for(speech.finish(), timeout=2)
+
+    assert metrics["errors"] == 2
+
+
+def test_sentence_splitter_merges_short_clauses():
+    splitter = SentenceSplitter(min_chars=10)
+
+    assert splitter.feed("Hi. The weather is") == []
+    assert splitter.feed(" sunny today. More") == ["Hi. The weather is sunny today."]
+    assert splitter.flush() == "More"
+    assert splitter.flush() is None
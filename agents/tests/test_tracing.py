@@ -0,0 +1,78 @@
+from contextlib import asynccontextmanager
+import mcp
+from mcp import types
+from mcp.server.lowlevel import Server
+from mcp.shared.memory import create_connected_server_and_client_session
+from app.voice_agent.tracing import TracedMcpTool, TurnTrace, current_trace
+
+
+# Mcp server with a tool answering with the traceparent of the call's _meta
+def _server():
+    server = Server("tracing-test")
+
+    @server.list_tools()
+    async def list_tools():
+        return [
+            types.Tool(
+                name="knowledge_search",
+                inputSchema={
+                    "type": "object",
+                    "properties": {"query": {"type": "string"}},
+                },
+            )
+        ]
+
+    @server.call_tool()
+    async def call_tool(name, arguments):
+        meta = server.request_context.meta
+        traceparent = getattr(meta, "traceparent", None) if meta else None
+        return [
+            types.TextContent(type="text", text=f"{arguments['query']}|{traceparent}")
+        ]
+
+    return server
+
+
+# Hands out the in memory client session instead of connecting to the server
+class FakeSessionManager:
+    def __init__(self, session: mcp.ClientSession):
+        self.session = session
+
+    async def create_session(self, headers=None):
+        return self.session
+
+
+# The session is opened in the test's task, anyio cancel scopes can't cross tasks
+@asynccontextmanager
+async def traced_tool():
+    async with create_connected_server_and_client_session(_server()) as session:
+        tools = await session.list_tools()
+        yield TracedMcpTool(
+            mcp_tool=tools.tools[0], mcp_session_manager=FakeSessionManager(session)
+        )
+
+
+async def _call(tool: TracedMcpTool, query: str):
+    result = await tool._run_async_impl(
+        args={"query": query}, tool_context=None, credential=None
+    )
+    return result.content[0].text
+
+
+async def test_tool_call_carries_the_traceparent_of_the_turn():
+    trace = TurnTrace("what does the guide say")
+    token = current_trace.set(trace)
+    try:
+        async with traced_tool() as tool:
+            text = await _call(tool, "guide")
+    finally:
+        current_trace.reset(token)
+
+    query, traceparent = text.split("|")
+    assert query == "guide"
+    assert traceparent.split("-")[1] == trace.trace_id
+
+
+async def test_tool_call_without_a_turn_has_no_traceparent():
+    async with traced_tool() as tool:
+        assert await _call(tool, "guide") == "guide|None"
@@ -1,39 +1,101 @@
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Query
 from app.utils.comman_utilis import validate_url
 from app.service.ingestion_factory import IngestionFactory
 from app.service.base_ingestion import IngestionContext
-from app.schema.ingestion import IngestionType
-from app.service.qdrant_service import search_query
+from app.config.settings import get_settings
+from app.schema.ingestion import CrawlOptions, IngestionType
+from app.schema.search import BatchSearchRequest
+from app.service.qdrant_service import search_query, search_queries
+from app.service.embedding_service import get_embeddings
+from app.service.search_cache import search_cache
+from app.service.jobs import job_queue
 
 # Initalizing the app
 ingestion_router = APIRouter()
 
 
-# Api to ingest the given data
-@ingestion_router.post("/ingest_data")
-async def ingest_url_pdf(input_source: str):
+# Api to ingest the given data, the ingestion runs as a background job
+# crawl=true ingests every page of the site reachable from the url
+@ingestion_router.post("/ingest_data", status_code=202)
+async def ingest_url_pdf(
+    input_source: str,
+    crawl: bool = False,
+    # Bounded here so an invalid value is a 422, not a failed CrawlOptions
+    max_depth: int | None = Query(default=None, ge=0),
+    max_pages: int | None = Query(default=None, ge=1),
+    same_domain: bool = True,
+    use_sitemap: bool | None = None,
+):
     ingestion_factory = IngestionFactory()
     # Ingest pdf logic
     if input_source.endswith(".pdf"):
-        pdf = ingestion_factory.create_ingestion_type(
+        ingestion = ingestion_factory.create_ingestion_type(
             IngestionContext(
                 ingestion_type=IngestionType.PDF, ingestion_source=input_source
             )
         )
-        return await pdf.extract_and_ingest_data()
     elif await validate_url(url_string=input_source):
         # Inget the url logic
-        url = ingestion_factory.create_ingestion_type(
+        crawl_options = None
+        if crawl:
+            settings = get_settings()
+            crawl_options = CrawlOptions(
+                max_depth=(
+                    max_depth if max_depth is not None else settings.CRAWL_MAX_DEPTH
+                ),
+                max_pages=(
+                    max_pages if max_pages is not None else settings.CRAWL_MAX_PAGES
+                ),
+                same_domain=same_domain,
+                use_sitemap=(
+                    use_sitemap
+                    if use_sitemap is not None
+                    else settings.CRAWL_USE_SITEMAP
+                ),
+            )
+        ingestion = ingestion_factory.create_ingestion_type(
             IngestionContext(
-                ingestion_type=IngestionType.URL, ingestion_source=input_source
+                ingestion_type=IngestionType.URL,
+                ingestion_source=input_source,
+                crawl_options=crawl_options,
             )
         )
-        return await url.extract_and_ingest_data()
     else:
         raise HTTPException(status_code=403, detail="File format not allowed/supported")
+    return job_queue.submit(source=input_source, ingestion=ingestion).to_dict()
+
+
+@ingestion_router.get("/jobs")
+async def list_jobs():
+    # Every ingestion job still in the history
+    return [job.to_dict() for job in job_queue.list()]
+
+
+@ingestion_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    # Status and progress of the ingestion job
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @ingestion_router.get("/search")
 async def search_vector_db(query: str):
     # Search the query in knowledge base
     return await search_query(content=query)
+
+
+@ingestion_router.post("/search_batch")
+async def search_vector_db_batch(request: BatchSearchRequest):
+    # Search all the queries in the knowledge base at once
+    return await search_queries(contents=request.queries)
+
+
+@ingestion_router.get("/cache/stats")
+async def cache_stats():
+    # Hit rate counters of the embedding and search result caches
+    return {
+        "embeddings": get_embeddings().cache.stats(),
+        "search": search_cache.stats(),
+    }
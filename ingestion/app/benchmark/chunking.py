@@ -0,0 +1,49 @@
+import asyncio
+import sys
+import time
+from colorama import Fore
+from pypdf import PdfReader
+from app.service.chunker import chunk_text, shutdown_chunker
+
+
+# Chunk every page concurrently with the given backend
+async def _chunk_pages(pages: list[str], backend: str):
+    chunks = await asyncio.gather(
+        *[chunk_text(page, backend=backend) for page in pages]
+    )
+    return sum(len(page_chunks) for page_chunks in chunks)
+
+
+# Time one chunking backend, the first page warms up the model(s) beforehand
+async def _measure(pages: list[str], backend: str):
+    await _chunk_pages(pages[:1], backend)
+    start = time.perf_counter()
+    num_chunks = await _chunk_pages(pages, backend)
+    elapsed = time.perf_counter() - start
+    print(
+        Fore.CYAN
+        + f"{backend}: {len(pages) / elapsed:.2f} pages/sec, {num_chunks / elapsed:.1f} chunks/sec ({elapsed:.2f}s)"
+    )
+    return elapsed
+
+
+async def compare_chunking_backends(filepaths: list[str]):
+    pages = [
+        page.extract_text() for path in filepaths for page in PdfReader(path).pages
+    ]
+    pages = [page for page in pages if page.strip()]
+    print(Fore.CYAN + f"Chunking {len(pages)} pages from {len(filepaths)} pdf(s)")
+    thread_time = await _measure(pages, "thread")
+    process_time = await _measure(pages, "process")
+    print(Fore.GREEN + f"Process backend speedup: {thread_time / process_time:.2f}x")
+
+
+# Poetry run statement to compare the thread and process chunking backends
+def run_chunking_benchmark():
+    if len(sys.argv) < 2:
+        print("Usage: poetry run benchmark_chunking <file.pdf> [<file.pdf> ...]")
+        return
+    try:
+        asyncio.run(compare_chunking_backends(filepaths=sys.argv[1:]))
+    finally:
+        shutdown_chunker()
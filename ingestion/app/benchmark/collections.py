@@ -0,0 +1,164 @@
+import asyncio
+import sys
+import time
+import httpx
+import numpy as np
+from colorama import Fore
+from qdrant_client.http import models
+from app.benchmark.results import latency_summary, write_results
+
+# Size of the synthetic vectors, the one of BAAI/bge-small-en
+VECTOR_SIZE = 384
+
+
+# Clustered unit vectors standing in for the chunk embeddings, and queries close to them
+def synthetic_vectors(num_points: int, num_queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, num_points // 200), VECTOR_SIZE))
+    points = centers[rng.integers(len(centers), size=num_points)]
+    points = points + 0.5 * rng.standard_normal(points.shape)
+    queries = points[rng.integers(num_points, size=num_queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape)
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return points.astype(np.float32), queries.astype(np.float32)
+
+
+# Exact top k ids of every query, the ground truth of the recall
+def exact_neighbours(points: np.ndarray, queries: np.ndarray, k: int):
+    scores = queries @ points.T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k].tolist()]
+
+
+# Heap memory of the qdrant server from its metrics, None in local mode
+async def server_memory():
+    from app.config.settings import get_settings
+
+    settings = get_settings()
+    if settings.QDRANT_URL == ":memory:":
+        return None
+    async with httpx.AsyncClient(timeout=settings.QDRANT_TIMEOUT) as http:
+        response = await http.get(
+            f"{settings.QDRANT_URL.rstrip('/')}/metrics",
+            headers={"api-key": settings.QDRANT_API_KEY},
+        )
+    for line in response.text.splitlines():
+        if line.startswith("memory_allocated_bytes"):
+            return int(float(line.split()[-1]))
+    return None
+
+
+# Wait until qdrant has finished indexing and quantizing the collection
+async def _wait_until_indexed(client, collection_name: str):
+    while True:
+        info = await client.get_collection(collection_name)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        await asyncio.sleep(0.5)
+
+
+async def _benchmark_profile(
+    profile: str, points: np.ndarray, queries: np.ndarray, truth: list, k: int
+):
+    from app.config.settings import get_settings
+    from app.service.collection_profiles import estimated_ram_bytes, search_params
+    from app.service.qdrant_service import create_new_collection, get_qdrant_client
+
+    collection_name = f"{get_settings().COLLECTION_NAME}-benchmark-{profile}"
+    async with get_qdrant_client() as client:
+        await client.delete_collection(collection_name)
+        memory_before = await server_memory()
+        await create_new_collection(
+            collection_name, profile=profile, vector_size=VECTOR_SIZE
+        )
+        try:
+            start = time.perf_counter()
+            for i in range(0, len(points), 1000):
+                await client.upsert(
+                    collection_name=collection_name,
+                    points=models.Batch(
+                        ids=list(range(i, min(i + 1000, len(points)))),
+                        vectors={"text": points[i : i + 1000].tolist()},
+                    ),
+                    wait=True,
+                )
+            await _wait_until_indexed(client, collection_name)
+            index_seconds = time.perf_counter() - start
+            memory_after = await server_memory()
+
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                response = await client.query_points(
+                    collection_name=collection_name,
+                    query=query.tolist(),
+                    using="text",
+                    search_params=search_params(),
+                    limit=k,
+                )
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & {point.id for point in response.points})
+        finally:
+            await client.delete_collection(collection_name)
+
+    result = {
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+        "search": latency_summary(latencies),
+        "index_seconds": round(index_seconds, 2),
+        "estimated_ram_bytes": estimated_ram_bytes(profile, len(points), VECTOR_SIZE),
+        "server_memory_delta_bytes": (
+            memory_after - memory_before
+            if memory_before is not None and memory_after is not None
+            else None
+        ),
+    }
+    print(Fore.CYAN + f"{profile}: {result}")
+    return result
+
+
+async def run_benchmark(num_points: int, num_queries: int, k: int, profiles: list):
+    from app.config.settings import get_settings
+    from app.service.qdrant_service import close_qdrant_client, open_qdrant_client
+
+    settings = get_settings()
+    points, queries = synthetic_vectors(num_points, num_queries)
+    truth = exact_neighbours(points, queries, k)
+    await open_qdrant_client()
+    try:
+        results = {}
+        for profile in profiles:
+            results[profile] = await _benchmark_profile(
+                profile, points, queries, truth, k
+            )
+    finally:
+        await close_qdrant_client()
+
+    config = {
+        "points": num_points,
+        "queries": num_queries,
+        "k": k,
+        "vector_size": VECTOR_SIZE,
+        "hnsw_m": settings.HNSW_M,
+        "hnsw_ef_construct": settings.HNSW_EF_CONSTRUCT,
+        "search_hnsw_ef": settings.SEARCH_HNSW_EF,
+        "quantization_rescore": settings.QUANTIZATION_RESCORE,
+        "quantization_oversampling": settings.QUANTIZATION_OVERSAMPLING,
+        # Local mode searches exactly and ignores the storage options
+        "qdrant": "local" if settings.QDRANT_URL == ":memory:" else "server",
+    }
+    path = write_results("collections", config, results)
+    print(Fore.GREEN + f"Results written to {path}")
+    return results
+
+
+# Poetry run statement to compare the recall, search latency and memory of the
+# collection profiles on the configured qdrant, arguments: points, queries, k and
+# the comma separated profiles
+def run_collection_benchmark():
+    from app.service.collection_profiles import PROFILES
+
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    profiles = sys.argv[4].split(",") if len(sys.argv) > 4 else list(PROFILES)
+    asyncio.run(run_benchmark(num_points, num_queries, k, profiles))
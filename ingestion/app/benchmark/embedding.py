@@ -0,0 +1,41 @@
+import asyncio
+import sys
+import time
+from colorama import Fore
+from app.service.embedding_service import get_text_model, embed_texts
+
+SAMPLE_CHUNK = (
+    "Qdrant stores every chunk of the ingested documents as a dense vector. "
+    "The voice agent queries these vectors to ground its answers in the knowledge base."
+)
+
+
+# Old path: one to_thread embedding call per chunk
+async def _embed_per_chunk(texts: list[str]):
+    tasks = [asyncio.to_thread(get_text_model().embed, [text]) for text in texts]
+    embeddings = await asyncio.gather(*tasks)
+    return [list(emb)[0] for emb in embeddings]
+
+
+# Time a single embedding strategy
+async def _measure(name: str, embed, texts: list[str]):
+    start = time.perf_counter()
+    await embed(texts)
+    elapsed = time.perf_counter() - start
+    print(Fore.CYAN + f"{name}: {len(texts) / elapsed:.1f} chunks/sec ({elapsed:.2f}s)")
+    return len(texts) / elapsed
+
+
+async def compare_embedding_paths(num_chunks: int):
+    texts = [f"{SAMPLE_CHUNK} Chunk number {i}." for i in range(num_chunks)]
+    # Warm up the model so the first measurement doesn't pay for loading it
+    await embed_texts([SAMPLE_CHUNK])
+    per_chunk = await _measure("per-chunk", _embed_per_chunk, texts)
+    batched = await _measure("batched", embed_texts, texts)
+    print(Fore.GREEN + f"Speedup: {batched / per_chunk:.2f}x")
+
+
+# Poetry run statement to compare per-chunk and batched embedding throughput
+def run_embedding_benchmark():
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    asyncio.run(compare_embedding_paths(num_chunks=num_chunks))
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from colorama import Fore
+from fastembed.sparse.sparse_embedding_base import SparseEmbedding
+from app.benchmark.results import latency_summary, write_results
+
+# Words the synthetic pages are made of
+VOCABULARY = (
+    "agent voice qdrant vector search chunk embedding document page source "
+    "latency query answer knowledge retrieval speech model index payload cache "
+    "pipeline stream batch tool server request session transcript audio"
+).split()
+
+
+# Deterministic stand-in for the fastembed model, no download or network needed
+class HashTextEmbedding:
+    embedding_size = 384
+
+    def embed(self, texts, batch_size: int = 256, **kwargs):
+        for text in texts:
+            seed = int.from_bytes(
+                hashlib.sha256(text.encode("utf-8")).digest()[:8], "big"
+            )
+            vector = np.random.default_rng(seed).standard_normal(self.embedding_size)
+            yield (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+# Stand-in for the bm25 model, term counts over hashed token ids
+class HashSparseEmbedding:
+    def embed(self, texts, **kwargs):
+        for text in texts:
+            counts = {}
+            for token in text.lower().split():
+                index = int.from_bytes(
+                    hashlib.sha256(token.strip(".,").encode("utf-8")).digest()[:4],
+                    "big",
+                )
+                counts[index] = counts.get(index, 0) + 1
+            yield SparseEmbedding(
+                values=np.array(list(counts.values()), dtype=np.float32),
+                indices=np.array(list(counts.keys()), dtype=np.int64),
+            )
+
+    def query_embed(self, texts, **kwargs):
+        yield from self.embed(texts)
+
+
+# Point the service at the local stand-ins, must run before the settings are loaded
+def use_stand_ins(workdir: str):
+    os.environ.update(
+        {
+            "QDRANT_URL": ":memory:",
+            "QDRANT_API_KEY": "",
+            "COLLECTION_NAME": "benchmark",
+            "TEXT_EMBEDDING_MODEL_NAME": "hash",
+            "CHUNKER_BACKEND": "thread",
+            "EMBEDDING_CACHE_PATH": "",
+            "MANIFEST_PATH": os.path.join(workdir, "manifest.sqlite3"),
+        }
+    )
+    from app.service import embedding_service, qdrant_service
+
+    embedding_service.get_text_model = lambda: HashTextEmbedding()
+    embedding_service.get_query_model = embedding_service.get_text_model
+    embedding_service.get_sparse_model = lambda: HashSparseEmbedding()
+    qdrant_service.get_text_model = embedding_service.get_text_model
+
+
+# Reproducible pages of random sentences
+def synthetic_pages(num_pages: int, sentences_per_page: int, seed: int = 0):
+    rng = random.Random(seed)
+    pages = []
+    for page in range(num_pages):
+        sentences = [
+            " ".join(rng.choices(VOCABULARY, k=rng.randint(8, 16))).capitalize() + "."
+            for _ in range(sentences_per_page)
+        ]
+        pages.append((f"benchmark_{page + 1}.pdf", " ".join(sentences)))
+    return pages
+
+
+# Run the searches with at most concurrency in flight, returns every latency
+async def _timed_searches(search, queries: list[str], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(query: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await search(query)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[timed(query) for query in queries])
+    return latencies
+
+
+async def run_benchmark(num_pages: int, num_queries: int, concurrency: int):
+    from app.config.settings import get_settings
+    from app.service.chunker import shutdown_chunker
+    from app.service.pdf.service import PdfIngestion
+    from app.service.qdrant_service import (
+        close_qdrant_client,
+        create_new_collection,
+        open_qdrant_client,
+        search_query,
+    )
+
+    pages = synthetic_pages(num_pages, sentences_per_page=20)
+
+    # The streaming pdf pipeline fed with the synthetic pages instead of a pdf file
+    class SyntheticIngestion(PdfIngestion):
+        async def _iter_pages(self, filepath: str):
+            for page in pages:
+                yield page
+
+    settings = get_settings()
+    await open_qdrant_client()
+    try:
+        await create_new_collection(settings.COLLECTION_NAME)
+        ingestion = SyntheticIngestion("benchmark")
+        stats = await ingestion._stream_and_ingest_data("benchmark")
+
+        rng = random.Random(1)
+        queries = [" ".join(rng.choices(VOCABULARY, k=6)) for _ in range(num_queries)]
+        settings.SEARCH_CACHE_ENABLED = False
+        uncached = await _timed_searches(search_query, queries, concurrency)
+        # Same queries again, answered from the search cache
+        settings.SEARCH_CACHE_ENABLED = True
+        await _timed_searches(search_query, queries, concurrency)
+        cached = await _timed_searches(search_query, queries, concurrency)
+    finally:
+        await close_qdrant_client()
+        shutdown_chunker()
+
+    results = {
+        "ingestion": {
+            "pages": stats["pages"],
+            "chunks": stats["chunks"],
+            "seconds": stats["seconds"],
+            "pages_per_second": round(stats["pages"] / stats["seconds"], 2),
+            "chunks_per_second": round(stats["chunks"] / stats["seconds"], 2),
+            "first_upsert_seconds": stats["first_upsert_seconds"],
+        },
+        "search": latency_summary(uncached),
+        "search_cached": latency_summary(cached),
+    }
+    config = {
+        "pages": num_pages,
+        "queries": num_queries,
+        "concurrency": concurrency,
+        "embedding": "hash stand-in",
+        "qdrant": "local in-memory",
+        "retrieval": settings.RETRIEVAL_MODE,
+    }
+    path = write_results("ingestion", config, results)
+    print(Fore.GREEN + f"{results}\nResults written to {path}")
+    return results
+
+
+# Poetry run statement to benchmark ingestion throughput and search latency
+# against the local stand-ins, arguments: pages, queries, search concurrency
+def run_ingestion_benchmark():
+    num_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    with tempfile.TemporaryDirectory() as workdir:
+        use_stand_ins(workdir)
+        asyncio.run(run_benchmark(num_pages, num_queries, concurrency))
@@ -1,13 +1,115 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Literal
 
 
 # Import all settings
 class Settings(BaseSettings):
+    # ":memory:" runs qdrant in local mode without a server
     QDRANT_URL: str
     QDRANT_API_KEY: str
     COLLECTION_NAME: str
     TEXT_EMBEDDING_MODEL_NAME: str
+    # Storage layout of new collections: memory, on_disk, scalar or binary (quantized)
+    COLLECTION_PROFILE: Literal["memory", "on_disk", "scalar", "binary"] = "memory"
+    # Hnsw graph of new collections, links per node and build time search width
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCT: int = 100
+    # Search width of the hnsw graph, qdrant's default when empty
+    SEARCH_HNSW_EF: int | None = None
+    # Quantized collections rescore oversampling x top-k candidates with the originals
+    QUANTIZATION_RESCORE: bool = True
+    QUANTIZATION_OVERSAMPLING: float = 2.0
+    # dense: search the "text" vectors, hybrid: fuse them with the sparse "bm25" vectors
+    # A hybrid collection also stores the sparse vectors at ingestion
+    RETRIEVAL_MODE: Literal["dense", "hybrid"] = "dense"
+    SPARSE_EMBEDDING_MODEL_NAME: str = "Qdrant/bm25"
+    # Results returned by a search and the minimum dense similarity of a result
+    SEARCH_TOP_K: int = 5
+    SEARCH_SCORE_THRESHOLD: float | None = None
+    # Candidates fetched from each of the dense and sparse vectors before the fusion
+    HYBRID_PREFETCH_LIMIT: int = 20
+    # Rerank the candidates with a cpu cross encoder
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL_NAME: str = "Xenova/ms-marco-MiniLM-L-6-v2"
+    # Candidates retrieved for the reranker, the best SEARCH_TOP_K are returned
+    RERANK_CANDIDATES: int = 20
+    # Reranks slower than this are counted and logged
+    RERANK_BUDGET_MS: float = 150
+    # Single threaded cross encoder workers, separate from the query embedding ones
+    RERANK_WORKERS: int = 2
+    # Connection settings of the app lifetime qdrant client
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_TIMEOUT: int = 10
+    QDRANT_POOL_SIZE: int = 20
+    # Number of chunks sent to the embedding model in one call
+    EMBEDDING_BATCH_SIZE: int = 64
+    # Number of embedding batches running in parallel
+    EMBEDDING_WORKERS: int = 2
+    # Number of points written to qdrant per upsert request
+    UPSERT_BATCH_SIZE: int = 128
+    # Number of upsert requests running in parallel
+    UPSERT_PARALLELISM: int = 4
+    # Retries of a failed upsert request, waiting UPSERT_RETRY_BACKOFF * 2^n seconds in between
+    UPSERT_MAX_RETRIES: int = 3
+    UPSERT_RETRY_BACKOFF: float = 0.5
+    # Cache the search results by query text, with SEARCH_CACHE_SEMANTIC a query within
+    # SEARCH_CACHE_SIMILARITY of a cached one also reuses its results
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL: float = 300
+    SEARCH_CACHE_MAX_ENTRIES: int = 1024
+    SEARCH_CACHE_SIMILARITY: float = 0.95
+    # The semantic tier is off until its threshold is tuned for the embedding model,
+    # queries differing only in a product name or error code are often above 0.95
+    SEARCH_CACHE_SEMANTIC: bool = False
+    # Stream pdf pages through extract -> chunk -> embed -> upsert stages
+    PDF_STREAMING_INGESTION: bool = False
+    # Maximum number of items waiting between two pipeline stages
+    PIPELINE_QUEUE_SIZE: int = 8
+    # Concurrent workers of each pipeline stage
+    PIPELINE_CHUNK_WORKERS: int = 2
+    PIPELINE_EMBED_WORKERS: int = 2
+    PIPELINE_UPSERT_WORKERS: int = 2
+    # Run the semantic chunker in threads or in a pool of worker processes
+    CHUNKER_BACKEND: Literal["thread", "process"] = "thread"
+    # Number of chunking processes, defaults to the number of cpus
+    CHUNKER_PROCESS_WORKERS: int | None = None
+    # embed: embed every finished chunk, pool: reuse the chunker's sentence vectors
+    CHUNK_VECTOR_MODE: Literal["embed", "pool"] = "embed"
+    # Number of embeddings kept in memory per process
+    EMBEDDING_CACHE_SIZE: int = 10000
+    # Sqlite file of the persistent embedding cache, leave empty to disable it
+    EMBEDDING_CACHE_PATH: str | None = ".cache/embeddings.sqlite3"
+    # Size budget of the persistent embedding cache in bytes
+    EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # Sqlite file recording the chunk ids stored for every source
+    MANIFEST_PATH: str = ".cache/manifest.sqlite3"
+    # Ingestion jobs running at the same time, the others wait in the queue
+    INGESTION_JOB_WORKERS: int = 2
+    # Finished jobs kept for the status api
+    INGESTION_JOB_HISTORY: int = 1000
+    # Cores the chunking and embedding may use across every job, defaults to one less
+    # than the number of cpus so the searches keep a core, every batch embeds on
+    # INGESTION_CPU_BUDGET // EMBEDDING_WORKERS threads
+    INGESTION_CPU_BUDGET: int | None = None
+    # Single threaded embedding workers reserved for the search queries
+    # At least 2 in hybrid mode so the dense and sparse query embeddings run together
+    QUERY_EMBEDDING_WORKERS: int = 1
+    # Default limits of a site crawl
+    CRAWL_MAX_DEPTH: int = 2
+    CRAWL_MAX_PAGES: int = 100
+    CRAWL_USE_SITEMAP: bool = True
+    # Pages fetched at the same time by one crawl
+    CRAWL_CONCURRENCY: int = 4
+    # Requests in flight to one host and seconds between two request starts
+    CRAWL_HOST_CONCURRENCY: int = 2
+    CRAWL_HOST_INTERVAL: float = 0.5
+    # Timeout of the sitemap downloads in seconds
+    CRAWL_SITEMAP_TIMEOUT: float = 10
+    # Log a json span of every request carrying a trace context, joined with the
+    # spans of the agents and tools services on the trace id
+    LOG_TRACE_SPANS: bool = True
 
     model_config = SettingsConfigDict(env_file=".env")
 
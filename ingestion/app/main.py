@@ -1,9 +1,46 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from app.api.api_endpoints import api_router_v1
+from app.service.qdrant_service import (
+    open_qdrant_client,
+    close_qdrant_client,
+    qdrant_health,
+)
+from app.service.chunker import shutdown_chunker
+from app.service.jobs import job_queue
+from app.service.url.crawler import close_crawler
+from app.utils.metrics import render_metrics
+from app.utils.tracing import (
+    log_span,
+    request_latency,
+    request_timings,
+    server_timing,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from colorama import Fore
+import time
 import uvicorn
 
-app = FastAPI()
+
+# Open the shared clients on startup and release them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_qdrant_client()
+    health = await qdrant_health()
+    if health["status"] != "ok":
+        print(Fore.RED + f"Qdrant is not reachable: {health['error']}")
+    job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.close()
+        await close_crawler()
+        await close_qdrant_client()
+        shutdown_chunker()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Adding middleware
 app.add_middleware(
@@ -15,10 +52,50 @@ app.add_middleware(
 )
 
 
+# Time every request, the stage timings go back in the Server-Timing header and
+# the trace context of the caller is echoed so the timings can be joined to its trace
+# A traced request is also logged as a span keyed by the trace id
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    start = time.perf_counter()
+    timings = {}
+    token = request_timings.set(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    total = time.perf_counter() - start
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    request_latency.observe(
+        total, method=request.method, route=route_path, status=response.status_code
+    )
+    response.headers["Server-Timing"] = server_timing(timings, total)
+    if traceparent := request.headers.get("traceparent"):
+        response.headers["traceparent"] = traceparent
+        log_span(
+            traceparent,
+            f"{request.method} {route_path}",
+            response.status_code,
+            timings,
+            total,
+        )
+    return response
+
+
+# Prometheus style latency histograms of the requests and search stages
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics()
+
+
 # To check the health of the server
 @app.get("/")
-def server_health():
-    return {"message": "Server successfully running in port 8000"}
+async def server_health():
+    return {
+        "message": "Server successfully running in port 8000",
+        "qdrant": await qdrant_health(),
+    }
 
 
 app.include_router(api_router_v1, prefix="/v1")
@@ -1,6 +1,18 @@
 from enum import Enum
+from pydantic import BaseModel, Field
 
 
 class IngestionType(Enum):
     PDF = "pdf"
     URL = "url"
+
+
+class CrawlOptions(BaseModel):
+    # Links followed away from the start url
+    max_depth: int = Field(ge=0)
+    # Pages crawled at most
+    max_pages: int = Field(ge=1)
+    # Only follow the links of the start url's domain
+    same_domain: bool = True
+    # Also crawl the urls listed in the site's sitemap.xml
+    use_sitemap: bool = True
@@ -0,0 +1,6 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1)
@@ -1,12 +1,18 @@
 from abc import ABC, abstractmethod
-from app.schema.ingestion import IngestionType
+from app.schema.ingestion import CrawlOptions, IngestionType
 
 
 # Ingestion Context
 class IngestionContext:
-    def __init__(self, ingestion_type: IngestionType, ingestion_source: str):
+    def __init__(
+        self,
+        ingestion_type: IngestionType,
+        ingestion_source: str,
+        crawl_options: CrawlOptions | None = None,
+    ):
         self.ingestion_type = ingestion_type
         self.ingestion_source = ingestion_source
+        self.crawl_options = crawl_options
 
 
 # BaseIngestion class to create any ingestion provider
@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from langchain_experimental.text_splitter import SemanticChunker
+from app.config.settings import get_settings
+from app.service.embedding_service import get_cpu_budget, get_embeddings, pool_vectors
+from app.service.progress import record_progress
+
+# Semantic splitter of the current process, loaded on first use
+_splitter: SemanticChunker | None = None
+# Process pool used by the process chunking backend
+_process_pool: ProcessPoolExecutor | None = None
+
+
+# Initalizing the semantic text splitter once per process
+def get_splitter():
+    global _splitter
+    if _splitter is None:
+        # In pool mode every sentence is embedded on its own so the
+        # cached sentence vectors can be pooled into the chunk vectors
+        buffer_size = 0 if get_settings().CHUNK_VECTOR_MODE == "pool" else 1
+        _splitter = SemanticChunker(
+            embeddings=get_embeddings(), buffer_size=buffer_size
+        )
+    return _splitter
+
+
+# Split the text into chunks in the current process
+def split_text(text: str):
+    return get_splitter().split_text(text)
+
+
+# Split the text into chunks along with their vectors when the chunk vectors are pooled
+def split_text_with_vectors(text: str):
+    splitter = get_splitter()
+    chunks = splitter.split_text(text)
+    if get_settings().CHUNK_VECTOR_MODE != "pool":
+        return [(chunk, None) for chunk in chunks]
+    embeddings = get_embeddings()
+    return [
+        (
+            chunk,
+            pool_vectors(
+                embeddings.embed_documents(
+                    re.split(splitter.sentence_split_regex, chunk)
+                )
+            ),
+        )
+        for chunk in chunks
+    ]
+
+
+# Load the embedding model as soon as a pool worker starts
+def _init_worker():
+    get_splitter()
+
+
+# Spawn the chunking workers, each of them loads its own embedding model
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=get_settings().CHUNKER_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _process_pool
+
+
+# Run the split function with the configured backend without blocking the event loop
+# Every split takes a slot of the cpu budget shared with the embedding batches
+async def _run_split(split, text: str, backend: str | None):
+    backend = backend or get_settings().CHUNKER_BACKEND
+    async with get_cpu_budget():
+        if backend == "process":
+            loop = asyncio.get_running_loop()
+            chunks = await loop.run_in_executor(_get_process_pool(), split, text)
+        else:
+            chunks = await asyncio.to_thread(split, text)
+    record_progress(chunks=len(chunks))
+    return chunks
+
+
+# Chunk the text
+async def chunk_text(text: str, backend: str | None = None):
+    return await _run_split(split_text, text, backend)
+
+
+# Chunk the text into (chunk, vector) pairs, the vector is None unless the chunk vectors are pooled
+async def chunk_text_with_vectors(text: str, backend: str | None = None):
+    return await _run_split(split_text_with_vectors, text, backend)
+
+
+# Stop the chunking workers
+def shutdown_chunker():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
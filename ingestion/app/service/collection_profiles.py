@@ -0,0 +1,70 @@
+from qdrant_client.http import models
+from app.config.settings import get_settings
+
+# Storage layouts of the collection, from the fastest to the smallest memory footprint
+#   memory: float32 vectors, hnsw graph and payloads in ram
+#   on_disk: vectors, hnsw graph and payloads memory mapped from disk
+#   scalar: int8 vectors in ram (4x smaller), the float32 originals on disk for rescoring
+#   binary: 1 bit vectors in ram (32x smaller), the float32 originals on disk for rescoring
+PROFILES = ("memory", "on_disk", "scalar", "binary")
+
+
+# Arguments of create_collection for the dense "text" vector of the profile
+def collection_config(profile: str, vector_size: int):
+    if profile not in PROFILES:
+        raise ValueError(
+            f"Unknown collection profile {profile}, expected one of {', '.join(PROFILES)}"
+        )
+    settings = get_settings()
+    on_disk = profile != "memory"
+    quantization = None
+    if profile == "scalar":
+        quantization = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    elif profile == "binary":
+        quantization = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return {
+        "vectors_config": {
+            "text": models.VectorParams(
+                size=vector_size, distance=models.Distance.COSINE, on_disk=on_disk
+            )
+        },
+        # The quantized profiles keep the graph in ram, only the originals go to disk
+        "hnsw_config": models.HnswConfigDiff(
+            m=settings.HNSW_M,
+            ef_construct=settings.HNSW_EF_CONSTRUCT,
+            on_disk=profile == "on_disk",
+        ),
+        "quantization_config": quantization,
+        "on_disk_payload": on_disk,
+    }
+
+
+# Search parameters of the dense vector, the quantization ones are ignored by
+# collections without quantization
+def search_params():
+    settings = get_settings()
+    return models.SearchParams(
+        hnsw_ef=settings.SEARCH_HNSW_EF,
+        quantization=models.QuantizationSearchParams(
+            rescore=settings.QUANTIZATION_RESCORE,
+            oversampling=settings.QUANTIZATION_OVERSAMPLING,
+        ),
+    )
+
+
+# Rough ram needed by the dense vectors and the hnsw graph of the profile
+def estimated_ram_bytes(profile: str, points: int, vector_size: int):
+    graph = points * get_settings().HNSW_M * 2 * 4
+    if profile == "memory":
+        return points * vector_size * 4 + graph
+    if profile == "on_disk":
+        return 0
+    if profile == "scalar":
+        return points * vector_size + graph
+    return points * ((vector_size + 7) // 8) + graph
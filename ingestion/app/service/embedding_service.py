@@ -0,0 +1,350 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+import numpy as np
+from fastembed import SparseTextEmbedding, TextEmbedding
+from langchain_core.embeddings import Embeddings
+from app.config.settings import get_settings
+
+
+# Cores the chunking and embedding of the ingestion may use across every job,
+# defaults to one less than the number of cpus so the searches keep a core
+def cpu_budget_size():
+    budget = get_settings().INGESTION_CPU_BUDGET
+    return budget if budget is not None else max(1, (os.cpu_count() or 2) - 1)
+
+
+# Threads of every ingestion embedding call, onnxruntime would use every core
+# for each batch and the concurrent batches would oversubscribe the budget
+def embedding_threads():
+    return max(1, cpu_budget_size() // max(1, get_settings().EMBEDDING_WORKERS))
+
+
+# Intialzing the text embedding model once per process
+# The same model backs the semantic chunker and the stored vectors
+@lru_cache
+def get_text_model():
+    return TextEmbedding(
+        get_settings().TEXT_EMBEDDING_MODEL_NAME, threads=embedding_threads()
+    )
+
+
+# Model instance of the search queries, single threaded on every query worker
+# so the searches never share the intra-op threads of the ingestion batches
+@lru_cache
+def get_query_model():
+    return TextEmbedding(get_settings().TEXT_EMBEDDING_MODEL_NAME, threads=1)
+
+
+# Intialzing the sparse (bm25) embedding model of the hybrid retrieval once per process
+@lru_cache
+def get_sparse_model():
+    return SparseTextEmbedding(get_settings().SPARSE_EMBEDDING_MODEL_NAME)
+
+
+# Content addressed embedding cache keyed by (model name, text hash)
+# An in process LRU tier sits in front of a size bounded sqlite tier shared by every process
+# The memory tier has its own lock so a lookup never waits behind a sqlite commit
+class EmbeddingCache:
+    def __init__(
+        self, model_name: str, max_size: int, path: str | None, max_bytes: int
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )""")
+            self._db.commit()
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+
+    @staticmethod
+    def _hash(text: str):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    # Look up the texts, None is returned for every text that isn't cached
+    # Without disk only the memory tier is looked up
+    def get_many(self, texts: List[str], disk: bool = True):
+        keys = [self._hash(text) for text in texts]
+        vectors: List[List[float] | None] = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                vectors.append(vector)
+            missing = list(
+                {key for key, vector in zip(keys, vectors) if vector is None}
+            )
+            if self._db is None or not disk or not missing:
+                self.misses += sum(vector is None for vector in vectors)
+                return vectors
+        found = {}
+        with self._db_lock:
+            # Stay below sqlite's limit on the number of query parameters
+            for i in range(0, len(missing), 500):
+                part = missing[i : i + 500]
+                rows = self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    [self.model_name, *part],
+                ).fetchall()
+                found.update(
+                    (key, np.frombuffer(blob, dtype=np.float32).tolist())
+                    for key, blob in rows
+                )
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, key) for key in found],
+                )
+                self._db.commit()
+        with self._lock:
+            for i, (key, vector) in enumerate(zip(keys, vectors)):
+                if vector is not None:
+                    continue
+                if key in found:
+                    vectors[i] = found[key]
+                    self._remember(key, found[key])
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return vectors
+
+    # Store the vectors of the texts in both tiers, without disk only in memory
+    def put_many(self, texts: List[str], vectors: List[List[float]], disk: bool = True):
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self._hash(text)
+                self._remember(key, vector)
+                rows.append(
+                    (
+                        self.model_name,
+                        key,
+                        np.asarray(vector, dtype=np.float32).tobytes(),
+                        now,
+                    )
+                )
+        if self._db is None or not disk:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._disk_bytes += sum(len(row[2]) for row in rows)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    # Drop the least recently used vectors until the disk tier is back under 90% of its budget
+    def _evict(self):
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._db.execute(
+                "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            self._db.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND text_hash = ?",
+                [(model, key) for model, key, _ in rows],
+            )
+            self._disk_bytes -= sum(size for _, _, size in rows)
+
+    # Hit rate counters of the cache
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "disk_bytes": self._disk_bytes if self._db is not None else 0,
+        }
+
+
+# Langchain embeddings backed by the fastembed model and the sentence cache
+class CachedTextEmbeddings(Embeddings):
+    def __init__(self, cache: EmbeddingCache):
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        # Only the texts never seen before go through the model
+        missing = list(
+            dict.fromkeys(
+                text for text, vector in zip(texts, vectors) if vector is None
+            )
+        )
+        if missing:
+            embedded = [
+                vector.tolist()
+                for vector in get_text_model().embed(missing, batch_size=len(missing))
+            ]
+            self.cache.put_many(missing, embedded)
+            embedded_by_text = dict(zip(missing, embedded))
+            vectors = [
+                vector if vector is not None else embedded_by_text[text]
+                for text, vector in zip(texts, vectors)
+            ]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    # Vectors of the search queries, from the memory tier or the query model
+    # The sqlite tier is left to the ingestion, a search never waits on its commits
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts, disk=False)
+        missing = list(
+            dict.fromkeys(
+                text for text, vector in zip(texts, vectors) if vector is None
+            )
+        )
+        if missing:
+            embedded = [vector.tolist() for vector in get_query_model().embed(missing)]
+            self.cache.put_many(missing, embedded, disk=False)
+            embedded_by_text = dict(zip(missing, embedded))
+            vectors = [
+                vector if vector is not None else embedded_by_text[text]
+                for text, vector in zip(texts, vectors)
+            ]
+        return vectors
+
+
+# Shared embedding backend of the current process
+@lru_cache
+def get_embeddings():
+    settings = get_settings()
+    return CachedTextEmbeddings(
+        EmbeddingCache(
+            model_name=settings.TEXT_EMBEDDING_MODEL_NAME,
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            path=settings.EMBEDDING_CACHE_PATH,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+        )
+    )
+
+
+# Mean pool the sentence vectors into one normalized chunk vector
+def pool_vectors(vectors: List[List[float]]):
+    pooled = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+    norm = np.linalg.norm(pooled)
+    return (pooled / norm if norm > 0 else pooled).tolist()
+
+
+# Dedicated pool for the embedding workers so large ingests never flood the default executor
+embedding_executor = ThreadPoolExecutor(
+    max_workers=get_settings().EMBEDDING_WORKERS, thread_name_prefix="embedding"
+)
+
+
+# Separate pool for the search queries so they never wait behind ingestion batches
+# In hybrid mode the dense and sparse query embeddings need a worker each
+def query_workers():
+    workers = get_settings().QUERY_EMBEDDING_WORKERS
+    if get_settings().RETRIEVAL_MODE == "hybrid":
+        return max(workers, 2)
+    return workers
+
+
+query_executor = ThreadPoolExecutor(
+    max_workers=query_workers(),
+    thread_name_prefix="query-embedding",
+)
+
+# Limit on the cpu heavy ingestion work running at the same time
+_cpu_budget: asyncio.Semaphore | None = None
+
+
+# Initalizing the global cpu budget of the ingestion
+# Every slot runs embedding_threads threads, so the slots never use more than the budget
+def get_cpu_budget():
+    global _cpu_budget
+    if _cpu_budget is None:
+        _cpu_budget = asyncio.Semaphore(
+            max(1, cpu_budget_size() // embedding_threads())
+        )
+    return _cpu_budget
+
+
+# Embed the texts in batches spread across the embedding workers
+# Every batch takes a slot of the cpu budget
+async def embed_texts(texts: List[str]):
+    loop = asyncio.get_running_loop()
+    batch_size = get_settings().EMBEDDING_BATCH_SIZE
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    async def embed(batch: List[str]):
+        async with get_cpu_budget():
+            return await loop.run_in_executor(
+                embedding_executor, get_embeddings().embed_documents, batch
+            )
+
+    results = await asyncio.gather(*[embed(batch) for batch in batches])
+    return [vector for batch in results for vector in batch]
+
+
+# Embed the search queries on the query workers, outside of the cpu budget
+async def embed_queries(texts: List[str]):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        query_executor, get_embeddings().embed_queries, texts
+    )
+
+
+# Sparse vectors of the documents, a single batch taking one slot of the cpu budget
+async def embed_sparse_texts(texts: List[str]):
+    loop = asyncio.get_running_loop()
+    async with get_cpu_budget():
+        return await loop.run_in_executor(
+            embedding_executor, lambda: list(get_sparse_model().embed(texts))
+        )
+
+
+# Sparse vectors of the search queries on the query workers
+async def embed_sparse_queries(texts: List[str]):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        query_executor, lambda: list(get_sparse_model().query_embed(texts))
+    )
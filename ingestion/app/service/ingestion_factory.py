@@ -15,7 +15,10 @@ class IngestionFactory:
             return PdfIngestion(ingestion_source=ingest_context.ingestion_source)
         # Initalize the url ingestion class
         elif ingest_context.ingestion_type == IngestionType.URL:
-            return UrlIngestion(ingestion_source=ingest_context.ingestion_source)
+            return UrlIngestion(
+                ingestion_source=ingest_context.ingestion_source,
+                crawl_options=ingest_context.crawl_options,
+            )
         # Raise a Error if a invalid format is provided
         else:
             raise ValueError("Invalid ingestion type provided")
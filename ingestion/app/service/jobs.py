@@ -0,0 +1,120 @@
+import asyncio
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from colorama import Fore
+from app.config.settings import get_settings
+from app.service.base_ingestion import BaseIngestion
+from app.service.progress import current_progress
+
+
+# One submitted ingestion and its progress
+class IngestionJob:
+    def __init__(self, source: str, ingestion: BaseIngestion):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.ingestion = ingestion
+        self.status = "queued"
+        self.progress = {"pages": 0, "chunks": 0, "vectors": 0}
+        self.result = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Runs the ingestion jobs in the background with a fixed number of workers
+# The cpu heavy work of every job shares the global cpu budget of the embedding service
+class JobQueue:
+    def __init__(self, workers: int, history_size: int):
+        self.workers = workers
+        self.history_size = history_size
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._queue: asyncio.Queue[IngestionJob] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    # Start the workers on the server's event loop
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.workers)
+            ]
+
+    def submit(self, source: str, ingestion: BaseIngestion):
+        job = IngestionJob(source=source, ingestion=ingestion)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._trim()
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return list(self._jobs.values())
+
+    # Forget the oldest finished jobs over the history size
+    def _trim(self):
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) <= self.history_size:
+                break
+            if job.finished:
+                del self._jobs[job_id]
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            await self._run(job)
+
+    async def _run(self, job: IngestionJob):
+        job.status = "running"
+        job.started_at = time.time()
+        # The ingestion code reports its progress into the job's counters
+        token = current_progress.set(job.progress)
+        try:
+            job.result = await job.ingestion.extract_and_ingest_data()
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            # The job runs in the background, its error is logged with the traceback
+            print(Fore.RED + f"Ingestion job {job.id} of {job.source} failed: {e}")
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            current_progress.reset(token)
+            job.finished_at = time.time()
+
+    # Stop the workers, the running jobs are cancelled
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Initalizing the ingestion job queue
+job_queue = JobQueue(
+    workers=get_settings().INGESTION_JOB_WORKERS,
+    history_size=get_settings().INGESTION_JOB_HISTORY,
+)
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import uuid
+from typing import List
+from app.config.settings import get_settings
+
+# Namespace of the deterministic chunk ids
+CHUNK_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "voice-agent/chunks")
+
+
+# Deterministic point id of a chunk derived from its source and content hash
+def chunk_id(source: str, text: str):
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{source}:{content_hash}"))
+
+
+# Per source manifest of the point ids stored in each collection
+# and of the sources (pdf pages, crawled pages) every ingested document is made of
+class SourceManifest:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS chunks (
+                collection TEXT NOT NULL,
+                source TEXT NOT NULL,
+                point_id TEXT NOT NULL,
+                PRIMARY KEY (collection, source, point_id)
+            )""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                document TEXT NOT NULL,
+                source TEXT NOT NULL,
+                PRIMARY KEY (collection, document, source)
+            )""")
+        self._db.commit()
+
+    # Point ids currently stored for the source
+    def get_ids(self, collection: str, source: str):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT point_id FROM chunks WHERE collection = ? AND source = ?",
+                (collection, source),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    # Replace the point ids stored for the source
+    def replace(self, collection: str, source: str, point_ids: List[str]):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM chunks WHERE collection = ? AND source = ?",
+                (collection, source),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO chunks (collection, source, point_id) VALUES (?, ?, ?)",
+                [(collection, source, point_id) for point_id in point_ids],
+            )
+            self._db.commit()
+
+    # Sources the document was made of when it was last ingested
+    def get_sources(self, collection: str, document: str):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT source FROM documents WHERE collection = ? AND document = ?",
+                (collection, document),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    # Replace the sources recorded for the document
+    def replace_sources(self, collection: str, document: str, sources: List[str]):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM documents WHERE collection = ? AND document = ?",
+                (collection, document),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO documents (collection, document, source) VALUES (?, ?, ?)",
+                [(collection, document, source) for source in sources],
+            )
+            self._db.commit()
+
+    # Forget the point ids of the source
+    def forget_source(self, collection: str, source: str):
+        self.replace(collection, source, [])
+
+    # Forget everything recorded for the collection
+    def forget_collection(self, collection: str):
+        with self._lock:
+            self._db.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            self._db.execute(
+                "DELETE FROM documents WHERE collection = ?", (collection,)
+            )
+            self._db.commit()
+
+
+# Initalizing the source manifest
+source_manifest = SourceManifest(get_settings().MANIFEST_PATH)
+
+
+# Diff the freshly chunked documents of a source against its manifest
+# Only the new chunks have to be embedded, the stale ones have to be deleted
+def plan_source_update(source: str, docs: List[dict]):
+    collection = get_settings().COLLECTION_NAME
+    stored_ids = source_manifest.get_ids(collection, source)
+    # The same chunk text twice in a source maps to one point
+    unique_docs = list({doc["id"]: doc for doc in docs}.values())
+    ids = [doc["id"] for doc in unique_docs]
+    return {
+        "source": source,
+        "ids": ids,
+        "docs": [doc for doc in unique_docs if doc["id"] not in stored_ids],
+        "stale_ids": list(stored_ids.difference(ids)),
+    }
+
+
+# Sources of the document's previous ingestion that are no longer part of it
+def plan_document_update(document: str, sources: List[str]):
+    collection = get_settings().COLLECTION_NAME
+    previous = source_manifest.get_sources(collection, document)
+    return {
+        "document": document,
+        "sources": sources,
+        "stale_sources": sorted(previous.difference(sources)),
+    }
+
+
+# Record the source's chunks once the update is stored
+def commit_source_update(update: dict):
+    source_manifest.replace(
+        get_settings().COLLECTION_NAME, update["source"], update["ids"]
+    )
+
+
+# Record the document's sources once the stale ones are deleted
+def commit_document_update(update: dict):
+    source_manifest.replace_sources(
+        get_settings().COLLECTION_NAME, update["document"], update["sources"]
+    )
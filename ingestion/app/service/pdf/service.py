@@ -1,9 +1,21 @@
 import os
 import asyncio
+import time
 from ..base_ingestion import BaseIngestion
 from pypdf import PdfReader
-import uuid
-from app.service.qdrant_service import splitter, insert_documents
+from app.config.settings import get_settings
+from app.service.pipeline import run_pipeline
+from app.service.chunker import chunk_text_with_vectors
+from app.service.manifest import chunk_id
+from app.service.progress import record_progress
+from app.service.qdrant_service import (
+    sync_documents,
+    build_points,
+    upsert_points,
+    finish_source_update,
+    plan_verified_update,
+    sync_document_sources,
+)
 from colorama import Fore
 
 
@@ -15,43 +27,149 @@ class PdfIngestion(BaseIngestion):
 
     # Extract and ingest data into vectordb
     async def extract_and_ingest_data(self):
+        if get_settings().PDF_STREAMING_INGESTION:
+            return await self._stream_and_ingest_data(self.ingestion_source)
+        start = time.perf_counter()
         data = await self._extract_data(self.ingestion_source)
         tasks = [
             self._process_and_store_document(source, text) for source, text in data
         ]
         # Running all the tasks concurrently
-        await asyncio.gather(*tasks)
-        return {"message": "Successfully Ingested Pdf!"}
+        pages = await asyncio.gather(*tasks)
+        # The pages a shorter version of the pdf no longer has are deleted
+        removed = await sync_document_sources(
+            self.ingestion_source, [source for source, _ in data]
+        )
+        return {
+            "message": "Successfully Ingested Pdf!",
+            "pages": len(pages),
+            "chunks": sum(page["chunks"] for page in pages),
+            "unchanged": sum(page["unchanged"] for page in pages),
+            "deleted": sum(page["deleted"] for page in pages),
+            "upsert_batches": sum(page["upsert_batches"] for page in pages),
+            "upsert_seconds": round(sum(page["upsert_seconds"] for page in pages), 3),
+            # Timings of every upsert batch along with the page it belongs to
+            "batches": [
+                {"source": source, **batch}
+                for (source, _), page in zip(data, pages)
+                for batch in page["batches"]
+            ],
+            **removed,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
 
-    # Split the text into chunks
-    def _chunk_text(self, text: str):
-        chunks = splitter.split_text(text)
+    # Split the text into chunks along with their pooled vectors
+    async def _chunk_text(self, text: str):
+        chunks = await chunk_text_with_vectors(text)
         return chunks
 
+    # Build the vector db documents for the chunks of a source
+    def _build_documents(self, source: str, chunks: list[tuple]):
+        return [
+            {
+                "text": chunk,
+                "source": source,
+                "id": chunk_id(source, chunk),
+                "vector": vector,
+            }
+            for chunk, vector in chunks
+        ]
+
     # Process and store the chunked documents to vector db
     async def _process_and_store_document(self, source: str, text: str):
         """Process a document and store its chunks in parallel."""
-        chunks = await asyncio.to_thread(self._chunk_text, text)
-        docs = [
-            {"text": chunk, "source": source, "id": str(uuid.uuid4())}
-            for chunk in chunks
-        ]
+        chunks = await self._chunk_text(text)
+        docs = self._build_documents(source, chunks)
         print(Fore.CYAN + f"Processing source : {source}")
-        await insert_documents(docs=docs)
+        stats = await sync_documents(source=source, docs=docs)
+        record_progress(pages=1)
+        return stats
 
     # Extract each page data
-    def _extract_page(self, page, filename_withoutext: str, page_number: int):
-        source_page = f"{filename_withoutext}_{page_number}.pdf"
+    # The page source keeps the pdf's path, two pdfs sharing a file name never
+    # share the manifest entries and point ids of their pages
+    def _extract_page(self, page, path_withoutext: str, page_number: int):
+        source_page = f"{path_withoutext}_{page_number}.pdf"
         return (source_page, page.extract_text())
 
     # Extract the data sync
     async def _extract_data(self, filepath: str):
         reader = PdfReader(filepath)
-        filename_withoutext = os.path.splitext(os.path.basename(filepath))[0]
+        record_progress(pages_total=len(reader.pages))
+        path_withoutext = os.path.splitext(filepath)[0]
         # Create async tasks for each page
         tasks = [
-            asyncio.to_thread(self._extract_page, page, filename_withoutext, i + 1)
+            asyncio.to_thread(self._extract_page, page, path_withoutext, i + 1)
             for i, page in enumerate(reader.pages)
         ]
         # Run all page extractions concurrently
         return await asyncio.gather(*tasks)
+
+    # Extract the pages one at a time so only the pages in flight are held in memory
+    async def _iter_pages(self, filepath: str):
+        reader = await asyncio.to_thread(PdfReader, filepath)
+        record_progress(pages_total=len(reader.pages))
+        path_withoutext = os.path.splitext(filepath)[0]
+        for i, page in enumerate(reader.pages):
+            yield await asyncio.to_thread(
+                self._extract_page, page, path_withoutext, i + 1
+            )
+
+    # Stream the pages through the extract -> chunk -> embed -> upsert stages
+    async def _stream_and_ingest_data(self, filepath: str):
+        settings = get_settings()
+        start = time.perf_counter()
+        stats = {
+            "pages": 0,
+            "chunks": 0,
+            "deleted": 0,
+            "upsert_batches": 0,
+            "upsert_seconds": 0.0,
+            "first_upsert_seconds": None,
+        }
+        sources = []
+
+        async def chunk_page(page):
+            source, text = page
+            stats["pages"] += 1
+            sources.append(source)
+            chunks = await self._chunk_text(text)
+            record_progress(pages=1)
+            print(Fore.CYAN + f"Processing source : {source}")
+            # Unchanged chunks are dropped here, before they reach the embed stage
+            return await plan_verified_update(
+                source, self._build_documents(source, chunks)
+            )
+
+        async def embed_docs(update):
+            update["points"] = await build_points(update["docs"])
+            return update
+
+        async def upsert_docs(update):
+            batches = await upsert_points(points=update["points"])
+            await finish_source_update(update)
+            stats["upsert_batches"] += len(batches)
+            stats["upsert_seconds"] += sum(batch["seconds"] for batch in batches)
+            stats["chunks"] += len(update["points"])
+            stats["deleted"] += len(update["stale_ids"])
+            if stats["first_upsert_seconds"] is None and update["points"]:
+                stats["first_upsert_seconds"] = round(time.perf_counter() - start, 3)
+
+        await run_pipeline(
+            source=self._iter_pages(filepath),
+            stages=[
+                (chunk_page, settings.PIPELINE_CHUNK_WORKERS),
+                (embed_docs, settings.PIPELINE_EMBED_WORKERS),
+                (upsert_docs, settings.PIPELINE_UPSERT_WORKERS),
+            ],
+            queue_size=settings.PIPELINE_QUEUE_SIZE,
+        )
+        # The pages a shorter version of the pdf no longer has are deleted
+        stats.update(await sync_document_sources(filepath, sources))
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        stats["upsert_seconds"] = round(stats["upsert_seconds"], 3)
+        print(
+            Fore.GREEN
+            + f"Streamed {stats['pages']} pages into {stats['chunks']} chunks"
+        )
+        return {"message": "Successfully Ingested Pdf!", **stats}
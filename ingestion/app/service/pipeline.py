@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Tuple
+
+# Marker pushed through the queues once a stage has no more items
+_DONE = object()
+
+# A stage is a worker coroutine plus the number of concurrent workers running it
+Stage = Tuple[Callable[[Any], Awaitable[Any]], int]
+
+
+# Feed the items from the source into the first queue
+async def _produce(source: AsyncIterator, out_queue: asyncio.Queue):
+    async for item in source:
+        await out_queue.put(item)
+    await out_queue.put(_DONE)
+
+
+# Run the stage workers until the input queue is drained
+async def _run_stage(
+    worker: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+    in_queue: asyncio.Queue,
+    out_queue: asyncio.Queue | None,
+):
+    async def _work():
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                # Hand the marker back so the sibling workers stop as well
+                await in_queue.put(_DONE)
+                return
+            result = await worker(item)
+            if out_queue is not None and result is not None:
+                await out_queue.put(result)
+
+    async with asyncio.TaskGroup() as group:
+        for _ in range(concurrency):
+            group.create_task(_work())
+    if out_queue is not None:
+        await out_queue.put(_DONE)
+
+
+# Stream the source through the stages over bounded queues
+# Every queue holds at most queue_size items so memory stays flat however large the source is
+async def run_pipeline(source: AsyncIterator, stages: List[Stage], queue_size: int):
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    async with asyncio.TaskGroup() as group:
+        group.create_task(_produce(source, queues[0]))
+        for i, (worker, concurrency) in enumerate(stages):
+            out_queue = queues[i + 1] if i + 1 < len(queues) else None
+            group.create_task(
+                _run_stage(worker, max(1, concurrency), queues[i], out_queue)
+            )
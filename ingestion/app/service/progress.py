@@ -0,0 +1,14 @@
+from contextvars import ContextVar
+
+# Progress counters of the ingestion job running in the current task
+# The pipeline stages run in child tasks and update the same counters
+current_progress: ContextVar[dict | None] = ContextVar("current_progress", default=None)
+
+
+# Add to the progress counters of the running job, a no-op outside of a job
+def record_progress(**counts: int):
+    progress = current_progress.get()
+    if progress is None:
+        return
+    for name, count in counts.items():
+        progress[name] = progress.get(name, 0) + count
@@ -1,94 +1,448 @@
 import asyncio
 from qdrant_client import AsyncQdrantClient
 from app.config.settings import get_settings
+from app.service.embedding_service import (
+    embed_queries,
+    embed_sparse_queries,
+    embed_sparse_texts,
+    embed_texts,
+    get_text_model,
+)
+from app.service.manifest import (
+    commit_document_update,
+    commit_source_update,
+    plan_document_update,
+    plan_source_update,
+    source_manifest,
+)
+from app.service.search_cache import search_cache
+from app.service.progress import record_progress
+from app.service.reranker import rerank
+from app.service.collection_profiles import collection_config, search_params
+from app.utils.tracing import record_stage
 from contextlib import asynccontextmanager
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_huggingface import HuggingFaceEmbeddings
-from fastembed import TextEmbedding
-from qdrant_client.http.models import Distance, VectorParams
+import httpx
+from qdrant_client.http.models import Modifier, SparseIndexParams, SparseVectorParams
 from qdrant_client.http import models
+from colorama import Fore
 import sys
+import time
 from typing import List
 
-# Intialzing the text and the image embedding models
-text_model = TextEmbedding(get_settings().TEXT_EMBEDDING_MODEL_NAME)
+# Name of the sparse vector stored next to the dense "text" vector
+SPARSE_VECTOR_NAME = "bm25"
+
+# App lifetime qdrant client, opened and closed by the fastapi lifespan
+_qdrant_client: AsyncQdrantClient | None = None
+
+
+# Build a qdrant client with a keep-alive connection pool
+def _create_qdrant_client():
+    settings = get_settings()
+    # Local mode keeps the collection in memory, used by the benchmarks
+    if settings.QDRANT_URL == ":memory:":
+        return AsyncQdrantClient(location=":memory:")
+    return AsyncQdrantClient(
+        url=settings.QDRANT_URL,
+        api_key=settings.QDRANT_API_KEY,
+        prefer_grpc=settings.QDRANT_PREFER_GRPC,
+        grpc_port=settings.QDRANT_GRPC_PORT,
+        timeout=settings.QDRANT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.QDRANT_POOL_SIZE,
+            max_keepalive_connections=settings.QDRANT_POOL_SIZE,
+        ),
+    )
+
+
+# Open the shared qdrant client
+async def open_qdrant_client():
+    global _qdrant_client
+    if _qdrant_client is None:
+        _qdrant_client = _create_qdrant_client()
+    return _qdrant_client
 
-emb = HuggingFaceEmbeddings(
-    model_name=get_settings().TEXT_EMBEDDING_MODEL_NAME,
-    model_kwargs={"device": "cpu"},
-    encode_kwargs={"normalize_embeddings": True},
-)
-# Initalizing the semantic text splitter
-splitter = SemanticChunker(embeddings=emb)
+
+# Close the shared qdrant client
+async def close_qdrant_client():
+    global _qdrant_client
+    if _qdrant_client is not None:
+        await _qdrant_client.close()
+        _qdrant_client = None
 
 
 # Intializing the qdrant client
+# Inside the app the shared client is reused, scripts get a short lived client
 @asynccontextmanager
 async def get_qdrant_client():
-    client = AsyncQdrantClient(
-        url=get_settings().QDRANT_URL, api_key=get_settings().QDRANT_API_KEY
-    )
+    if _qdrant_client is not None:
+        yield _qdrant_client
+        return
+    client = _create_qdrant_client()
     try:
         yield client
     finally:
         await client.close()
 
 
-# Create new collection
-async def create_new_collection(collection_name: str):
+# Check whether qdrant is reachable
+async def qdrant_health():
+    try:
+        async with get_qdrant_client() as client:
+            info = await asyncio.wait_for(
+                client.info(), timeout=get_settings().QDRANT_TIMEOUT
+            )
+        return {"status": "ok", "version": info.version}
+    except Exception as e:
+        return {"status": "unavailable", "error": str(e)}
+
+
+# Whether the sparse vectors are stored and searched
+def hybrid_enabled():
+    return get_settings().RETRIEVAL_MODE == "hybrid"
+
+
+# Create new collection with the storage layout of the profile
+# The profile defaults to the COLLECTION_PROFILE setting
+async def create_new_collection(
+    collection_name: str, profile: str | None = None, vector_size: int | None = None
+):
+    profile = profile or get_settings().COLLECTION_PROFILE
+    config = collection_config(profile, vector_size or get_text_model().embedding_size)
     async with get_qdrant_client() as client:
         exits = await client.collection_exists(collection_name=collection_name)
         if not exits:
+            # The idf of the bm25 vectors is computed by qdrant over the collection
+            sparse_vectors_config = (
+                {
+                    SPARSE_VECTOR_NAME: SparseVectorParams(
+                        modifier=Modifier.IDF,
+                        index=SparseIndexParams(on_disk=profile != "memory"),
+                    )
+                }
+                if hybrid_enabled()
+                else None
+            )
             await client.create_collection(
                 collection_name=collection_name,
-                vectors_config={
-                    "text": VectorParams(
-                        size=text_model.embedding_size, distance=Distance.COSINE
-                    )
-                },
+                sparse_vectors_config=sparse_vectors_config,
+                **config,
+            )
+            # Keyword index for the filters and deletes by source
+            await client.create_payload_index(
+                collection_name=collection_name,
+                field_name="source",
+                field_schema=models.PayloadSchemaType.KEYWORD,
+            )
+            # The chunks recorded for an earlier collection of that name are gone
+            source_manifest.forget_collection(collection_name)
+            print(
+                f"New collection created with collection name: {collection_name} ({profile} profile)"
             )
-            print("New collection created with collection name: ", collection_name)
         else:
             print("Collection already exists !")
 
 
+# Upsert one batch of points, retrying with exponential backoff on failure
+async def _upsert_batch(
+    client: AsyncQdrantClient, batch_number: int, points: List[models.PointStruct]
+):
+    settings = get_settings()
+    start = time.perf_counter()
+    for attempt in range(1, settings.UPSERT_MAX_RETRIES + 2):
+        try:
+            await client.upsert(
+                collection_name=settings.COLLECTION_NAME, points=points, wait=True
+            )
+            return {
+                "batch": batch_number,
+                "points": len(points),
+                "attempts": attempt,
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+        except Exception as e:
+            if attempt > settings.UPSERT_MAX_RETRIES:
+                raise
+            delay = settings.UPSERT_RETRY_BACKOFF * 2 ** (attempt - 1)
+            print(
+                Fore.YELLOW
+                + f"Upsert of batch {batch_number} failed ({e}), retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+# Upload the embedded points to the collection in parallel batches
+# Returns the timings and counts of every batch once the points are persisted
+async def upsert_points(points: List[models.PointStruct]):
+    settings = get_settings()
+    batch_size = settings.UPSERT_BATCH_SIZE
+    semaphore = asyncio.Semaphore(settings.UPSERT_PARALLELISM)
+
+    async def upload(batch_number: int, batch: List[models.PointStruct]):
+        async with semaphore:
+            result = await _upsert_batch(client, batch_number, batch)
+        record_progress(vectors=len(batch))
+        return result
+
+    async with get_qdrant_client() as client:
+        try:
+            return await asyncio.gather(
+                *[
+                    upload(i // batch_size, points[i : i + batch_size])
+                    for i in range(0, len(points), batch_size)
+                ]
+            )
+        finally:
+            if points:
+                search_cache.invalidate()
+
+
+# Qdrant sparse vector of a fastembed sparse embedding
+def _sparse_vector(embedding):
+    return models.SparseVector(
+        indices=embedding.indices.tolist(), values=embedding.values.tolist()
+    )
+
+
+# Embed the documents and build the qdrant points for them
+# Documents chunked in pool mode already carry their vector and skip the second pass
+async def build_points(docs: List[dict]):
+    missing = [doc for doc in docs if doc.get("vector") is None]
+    embeddings = await embed_texts([doc["text"] for doc in missing])
+    for doc, txt_emb in zip(missing, embeddings):
+        doc["vector"] = txt_emb
+    vectors = [{"text": doc["vector"]} for doc in docs]
+    if hybrid_enabled() and docs:
+        sparse = await embed_sparse_texts([doc["text"] for doc in docs])
+        for vector, embedding in zip(vectors, sparse):
+            vector[SPARSE_VECTOR_NAME] = _sparse_vector(embedding)
+    return [
+        models.PointStruct(
+            id=doc["id"],
+            vector=vector,
+            payload={"text": doc["text"], "source": doc["source"]},
+        )
+        for doc, vector in zip(docs, vectors)
+    ]
+
+
 # Insert documents into qdrantvectordb
 async def insert_documents(docs: List[dict]):
-    # Run embeddings concurrently
-    tasks = [asyncio.to_thread(text_model.embed, [doc["text"]]) for doc in docs]
-    embeddings = await asyncio.gather(*tasks)
-
-    points = []
-    for doc, emb in zip(docs, embeddings):
-        txt_emb = list(emb)[0]
-        points.append(
-            models.PointStruct(
-                id=doc["id"],
-                vector={"text": txt_emb},
-                payload={"text": doc["text"], "source": doc["source"]},
+    start = time.perf_counter()
+    batches = []
+    # Only one window of chunks is embedded at a time to keep memory bounded
+    window_size = get_settings().EMBEDDING_BATCH_SIZE * get_settings().EMBEDDING_WORKERS
+    for i in range(0, len(docs), window_size):
+        points = await build_points(docs[i : i + window_size])
+        batches.extend(await upsert_points(points=points))
+
+    elapsed = time.perf_counter() - start
+    chunks_per_second = len(docs) / elapsed if elapsed > 0 else 0.0
+    print(
+        Fore.GREEN
+        + f"Embedded {len(docs)} chunks in {elapsed:.2f}s ({chunks_per_second:.1f} chunks/sec)"
+    )
+    return {
+        "chunks": len(docs),
+        "seconds": round(elapsed, 3),
+        "chunks_per_second": round(chunks_per_second, 1),
+        "upsert_batches": len(batches),
+        "upsert_seconds": round(sum(batch["seconds"] for batch in batches), 3),
+        "batches": batches,
+    }
+
+
+# Delete the points from the collection
+async def delete_points(point_ids: List[str]):
+    async with get_qdrant_client() as client:
+        await client.delete(
+            collection_name=get_settings().COLLECTION_NAME,
+            points_selector=models.PointIdsList(points=point_ids),
+        )
+    search_cache.invalidate()
+
+
+# Diff the source's documents against the manifest after checking the manifest
+# against the collection, a source whose stored points don't match the manifest
+# (the collection was dropped or points were deleted behind our back) is stored again
+async def plan_verified_update(source: str, docs: List[dict]):
+    collection = get_settings().COLLECTION_NAME
+    stored_ids = source_manifest.get_ids(collection, source)
+    if stored_ids:
+        async with get_qdrant_client() as client:
+            stored = await client.count(
+                collection_name=collection,
+                count_filter=models.Filter(
+                    must=[
+                        models.FieldCondition(
+                            key="source", match=models.MatchValue(value=source)
+                        )
+                    ]
+                ),
+                exact=True,
             )
+        if stored.count != len(stored_ids):
+            print(Fore.YELLOW + f"{source}: manifest out of sync, storing every chunk")
+            source_manifest.forget_source(collection, source)
+    return plan_source_update(source, docs)
+
+
+# Delete the chunks of the sources that are no longer part of the document
+# e.g. the pages dropped from a re-ingested pdf or gone from a re-crawled site
+async def sync_document_sources(document: str, sources: List[str]):
+    update = plan_document_update(document, sources)
+    collection = get_settings().COLLECTION_NAME
+    deleted = 0
+    for source in update["stale_sources"]:
+        stale_ids = list(source_manifest.get_ids(collection, source))
+        if stale_ids:
+            await delete_points(stale_ids)
+            deleted += len(stale_ids)
+        source_manifest.forget_source(collection, source)
+    commit_document_update(update)
+    if update["stale_sources"]:
+        print(
+            Fore.CYAN
+            + f"{document}: removed {len(update['stale_sources'])} stale sources ({deleted} chunks)"
         )
-    async with get_qdrant_client() as client:
-        client.upload_points(
-            collection_name=get_settings().COLLECTION_NAME, points=points
+    return {"removed_sources": len(update["stale_sources"]), "removed_chunks": deleted}
+
+
+# Store the source's new chunks and drop the ones that no longer exist
+async def finish_source_update(update: dict):
+    if update["stale_ids"]:
+        await delete_points(update["stale_ids"])
+    commit_source_update(update)
+
+
+# Incrementally re-ingest the documents of a source
+async def sync_documents(source: str, docs: List[dict]):
+    update = await plan_verified_update(source, docs)
+    stats = await insert_documents(docs=update["docs"])
+    await finish_source_update(update)
+    unchanged = len(update["ids"]) - len(update["docs"])
+    print(
+        Fore.CYAN
+        + f"{source}: {len(update['docs'])} new, {unchanged} unchanged, {len(update['stale_ids'])} stale chunks"
+    )
+    return {**stats, "unchanged": unchanged, "deleted": len(update["stale_ids"])}
+
+
+# Embed the search queries for the configured retrieval mode
+# The sparse vectors are None in dense mode
+async def _embed_search_queries(contents: List[str]):
+    stage_start = time.perf_counter()
+    if hybrid_enabled():
+        dense, sparse = await asyncio.gather(
+            embed_queries(contents), embed_sparse_queries(contents)
         )
+        sparse = [_sparse_vector(embedding) for embedding in sparse]
+    else:
+        dense, sparse = await embed_queries(contents), [None] * len(contents)
+    record_stage("embed", time.perf_counter() - stage_start)
+    return dense, sparse
+
+
+# Arguments of the qdrant query of one search
+# Hybrid searches fuse the dense and sparse candidates with reciprocal rank fusion,
+# the score threshold applies to the dense similarity as the fused scores are ranks
+def _search_request(dense: List[float], sparse: models.SparseVector | None):
+    settings = get_settings()
+    limit = (
+        settings.RERANK_CANDIDATES if settings.RERANK_ENABLED else settings.SEARCH_TOP_K
+    )
+    request = {"with_payload": ["source", "text"], "limit": limit}
+    if sparse is None:
+        return {
+            **request,
+            "query": dense,
+            "using": "text",
+            "score_threshold": settings.SEARCH_SCORE_THRESHOLD,
+            "params": search_params(),
+        }
+    return {
+        **request,
+        "prefetch": [
+            models.Prefetch(
+                query=dense,
+                using="text",
+                limit=settings.HYBRID_PREFETCH_LIMIT,
+                score_threshold=settings.SEARCH_SCORE_THRESHOLD,
+                params=search_params(),
+            ),
+            models.Prefetch(
+                query=sparse,
+                using=SPARSE_VECTOR_NAME,
+                limit=settings.HYBRID_PREFETCH_LIMIT,
+            ),
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+    }
+
+
+# Rerank the retrieved candidates when the reranker is enabled
+async def _rerank(content: str, points: List[models.ScoredPoint]):
+    settings = get_settings()
+    if not settings.RERANK_ENABLED:
+        return points
+    return await rerank(content, points, settings.SEARCH_TOP_K)
 
 
 # Search the user query in the knowledge base
 async def search_query(content: str):
-    txt_emb = list(text_model.embed([content]))[0]
+    start = time.perf_counter()
+    use_cache = get_settings().SEARCH_CACHE_ENABLED
+    if use_cache and (cached := search_cache.get_exact(content)) is not None:
+        search_cache.record_latency(hit=True, seconds=time.perf_counter() - start)
+        record_stage("cache", time.perf_counter() - start)
+        return cached
+    dense, sparse = await _embed_search_queries([content])
+    txt_emb = dense[0]
+    if use_cache and (cached := search_cache.get_semantic(txt_emb)) is not None:
+        search_cache.record_latency(hit=True, seconds=time.perf_counter() - start)
+        return cached
+    generation = search_cache.generation
+    stage_start = time.perf_counter()
+    async with get_qdrant_client() as client:
+        request = _search_request(txt_emb, sparse[0])
+        response = await client.query_points(
+            collection_name=get_settings().COLLECTION_NAME,
+            search_params=request.pop("params", None),
+            **request,
+        )
+        print(response.points)
+    record_stage("qdrant", time.perf_counter() - stage_start)
+    res = await _rerank(content, response.points)
+    if use_cache:
+        search_cache.put(content, txt_emb, res, generation)
+        search_cache.record_latency(hit=False, seconds=time.perf_counter() - start)
+    return res
+
+
+# Search several user queries in the knowledge base with one embedding call and one qdrant request
+async def search_queries(contents: List[str]):
+    txt_embs, sparse = await _embed_search_queries(contents)
+    stage_start = time.perf_counter()
     async with get_qdrant_client() as client:
-        res = await client.search(
+        responses = await client.query_batch_points(
             collection_name=get_settings().COLLECTION_NAME,
-            query_vector=("text", txt_emb),
-            with_payload=["url", "text"],
-            limit=5,
+            requests=[
+                models.QueryRequest(**_search_request(txt_emb, sparse_emb))
+                for txt_emb, sparse_emb in zip(txt_embs, sparse)
+            ],
         )
-        print(res)
-        return res
+    record_stage("qdrant", time.perf_counter() - stage_start)
+    return await asyncio.gather(
+        *[
+            _rerank(content, response.points)
+            for content, response in zip(contents, responses)
+        ]
+    )
 
 
 # Poetry run statement to create a new qdrant collection
+# arguments: collection name and optionally the profile (memory, on_disk, scalar, binary)
 def create_new_qdrant_collection():
     collection_name = sys.argv[1]
-    asyncio.run(create_new_collection(collection_name=collection_name))
+    profile = sys.argv[2] if len(sys.argv) > 2 else None
+    asyncio.run(create_new_collection(collection_name=collection_name, profile=profile))
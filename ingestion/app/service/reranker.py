@@ -0,0 +1,58 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+from fastembed.rerank.cross_encoder import TextCrossEncoder
+from qdrant_client.http import models
+from colorama import Fore
+from app.config.settings import get_settings
+from app.utils.metrics import Counter
+from app.utils.tracing import record_stage
+
+# Reranks that took longer than the budget
+rerank_over_budget = Counter(
+    "search_rerank_over_budget_total",
+    "Reranks slower than RERANK_BUDGET_MS",
+)
+
+
+# Own pool so the reranks never queue behind the query embeddings
+rerank_executor = ThreadPoolExecutor(
+    max_workers=get_settings().RERANK_WORKERS,
+    thread_name_prefix="rerank",
+)
+
+
+# Intializing the cross encoder once per process
+# Single threaded, the reranks run in parallel on the rerank workers instead
+@lru_cache
+def get_reranker():
+    return TextCrossEncoder(get_settings().RERANK_MODEL_NAME, threads=1)
+
+
+# Score the candidates against the query with the cross encoder and keep the best top_k
+# The returned points carry the cross encoder score instead of the retrieval score
+async def rerank(query: str, points: List[models.ScoredPoint], top_k: int):
+    if not points:
+        return points
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    documents = [point.payload.get("text", "") for point in points]
+    scores = await loop.run_in_executor(
+        rerank_executor, lambda: list(get_reranker().rerank(query, documents))
+    )
+    elapsed = time.perf_counter() - start
+    record_stage("rerank", elapsed)
+    budget_ms = get_settings().RERANK_BUDGET_MS
+    if elapsed * 1000 > budget_ms:
+        rerank_over_budget.inc()
+        print(
+            Fore.YELLOW
+            + f"Rerank of {len(points)} candidates took {elapsed * 1000:.0f}ms, budget {budget_ms:.0f}ms"
+        )
+    ranked = sorted(zip(scores, points), key=lambda pair: pair[0], reverse=True)
+    return [
+        point.model_copy(update={"score": float(score)})
+        for score, point in ranked[:top_k]
+    ]
@@ -0,0 +1,121 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Any, List
+import numpy as np
+from app.config.settings import get_settings
+
+
+# Cached search results of one query
+class _CacheEntry:
+    def __init__(self, vector: List[float], results: Any, expires_at: float):
+        self.vector = np.asarray(vector, dtype=np.float32)
+        self.results = results
+        self.expires_at = expires_at
+
+
+# Result cache in front of the knowledge base search
+# The exact tier matches the normalized query text, the semantic tier matches
+# any cached query whose embedding is within the cosine similarity threshold
+# when it is enabled
+class SearchResultCache:
+    def __init__(self, max_entries: int, ttl: float, similarity: float, semantic: bool):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.semantic = semantic
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        # Bumped on every write to the collection so stale results are never stored
+        self.generation = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._latency = {"hit": [0, 0.0], "miss": [0, 0.0]}
+
+    @staticmethod
+    def _normalize(query: str):
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        for key in [
+            key for key, entry in self._entries.items() if entry.expires_at <= now
+        ]:
+            del self._entries[key]
+
+    # Look up the query text
+    def get_exact(self, query: str):
+        self._drop_expired()
+        entry = self._entries.get(self._normalize(query))
+        if entry is None:
+            return None
+        self._entries.move_to_end(self._normalize(query))
+        self.exact_hits += 1
+        return entry.results
+
+    # Look up the closest cached query embedding
+    def get_semantic(self, vector: List[float]):
+        if not self.semantic or not self._entries:
+            self.misses += 1
+            return None
+        keys = list(self._entries)
+        matrix = np.stack([self._entries[key].vector for key in keys])
+        query = np.asarray(vector, dtype=np.float32)
+        scores = (
+            matrix
+            @ query
+            / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        )
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(keys[best])
+        self.semantic_hits += 1
+        return self._entries[keys[best]].results
+
+    # Store the results unless the collection changed since the search started
+    def put(self, query: str, vector: List[float], results: Any, generation: int):
+        if generation != self.generation:
+            return
+        key = self._normalize(query)
+        self._entries[key] = _CacheEntry(vector, results, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Drop every cached result, called whenever the collection is written
+    def invalidate(self):
+        self.generation += 1
+        self._entries.clear()
+
+    # Record how long a cached or uncached search took
+    def record_latency(self, hit: bool, seconds: float):
+        bucket = self._latency["hit" if hit else "miss"]
+        bucket[0] += 1
+        bucket[1] += seconds
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "avg_hit_ms": self._average_ms("hit"),
+            "avg_miss_ms": self._average_ms("miss"),
+        }
+
+    def _average_ms(self, kind: str):
+        count, total = self._latency[kind]
+        return round(total / count * 1000, 3) if count else None
+
+
+# Initalizing the search result cache
+search_cache = SearchResultCache(
+    max_entries=get_settings().SEARCH_CACHE_MAX_ENTRIES,
+    ttl=get_settings().SEARCH_CACHE_TTL,
+    similarity=get_settings().SEARCH_CACHE_SIMILARITY,
+    semantic=get_settings().SEARCH_CACHE_SEMANTIC,
+)
@@ -0,0 +1,198 @@
+import asyncio
+import time
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from urllib.parse import urldefrag, urljoin, urlparse
+import aiohttp
+from crawl4ai import AsyncWebCrawler
+from colorama import Fore
+from app.config.settings import get_settings
+from app.schema.ingestion import CrawlOptions
+
+# Sitemap indexes nested deeper than this are not followed
+MAX_SITEMAP_DEPTH = 2
+
+# The browser backed crawler shared by every url ingestion
+_crawler: AsyncWebCrawler | None = None
+_crawler_lock = asyncio.Lock()
+
+
+# Start the shared crawler on first use, the browser is launched only once
+async def get_crawler():
+    global _crawler
+    async with _crawler_lock:
+        if _crawler is None:
+            crawler = AsyncWebCrawler()
+            await crawler.start()
+            _crawler = crawler
+    return _crawler
+
+
+# Close the shared crawler and its browser
+async def close_crawler():
+    global _crawler
+    async with _crawler_lock:
+        if _crawler is not None:
+            await _crawler.close()
+            _crawler = None
+
+
+# Limits the requests sent to every host, shared by all the crawls so that
+# two jobs crawling the same site still respect the limits together
+class HostRateLimiter:
+    def __init__(self, concurrency: int, interval: float):
+        self.concurrency = concurrency
+        self.interval = interval
+        # Per host: concurrency semaphore, lock and time the next request may start
+        self._hosts: dict[str, list] = {}
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        host = urlparse(url).netloc
+        state = self._hosts.setdefault(
+            host, [asyncio.Semaphore(self.concurrency), asyncio.Lock(), 0.0]
+        )
+        semaphore, lock, _ = state
+        async with semaphore:
+            async with lock:
+                wait = state[2] - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                state[2] = time.monotonic() + self.interval
+            yield
+
+
+# Initalizing the global host rate limiter
+host_limiter = HostRateLimiter(
+    concurrency=get_settings().CRAWL_HOST_CONCURRENCY,
+    interval=get_settings().CRAWL_HOST_INTERVAL,
+)
+
+
+# Fetch one page with the shared crawler under the host rate limits
+async def fetch_page(url: str):
+    crawler = await get_crawler()
+    async with host_limiter.limit(url):
+        return await crawler.arun(url=url)
+
+
+# Drop the fragment so the same page is crawled only once
+def normalize_url(url: str):
+    return urldefrag(url.strip())[0]
+
+
+def _host(url: str):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+# Whether the link should be crawled from the start url
+def is_allowed(url: str, start_url: str, same_domain: bool):
+    if urlparse(url).scheme not in ("http", "https"):
+        return False
+    return not same_domain or _host(url) == _host(start_url)
+
+
+# Absolute urls of the links found on the crawled page
+def page_links(result, same_domain: bool):
+    links = result.links or {}
+    groups = ["internal"] if same_domain else ["internal", "external"]
+    hrefs = []
+    for group in groups:
+        for link in links.get(group, []):
+            href = link.get("href") if isinstance(link, dict) else link
+            if href:
+                hrefs.append(normalize_url(urljoin(result.url, href)))
+    return hrefs
+
+
+# Page urls listed in the sitemap of the site, following the sitemap indexes
+async def sitemap_urls(start_url: str):
+    parsed = urlparse(start_url)
+    pending = [(f"{parsed.scheme}://{parsed.netloc}/sitemap.xml", 0)]
+    urls = []
+    timeout = aiohttp.ClientTimeout(total=get_settings().CRAWL_SITEMAP_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while pending:
+            sitemap_url, depth = pending.pop()
+            try:
+                async with host_limiter.limit(sitemap_url):
+                    async with session.get(sitemap_url) as response:
+                        if response.status != 200:
+                            continue
+                        root = ET.fromstring(await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError, ET.ParseError) as e:
+                print(Fore.YELLOW + f"Skipping sitemap {sitemap_url}: {e}")
+                continue
+            for element in root.iter():
+                if not element.tag.endswith("loc") or not element.text:
+                    continue
+                if root.tag.endswith("sitemapindex"):
+                    if depth < MAX_SITEMAP_DEPTH:
+                        pending.append((element.text.strip(), depth + 1))
+                else:
+                    urls.append(normalize_url(element.text))
+    return urls
+
+
+# Crawl the site breadth first and yield (url, markdown) for every page as it arrives
+# The pages are fetched concurrently, at most max_pages of them down to max_depth links
+# away from the start url, the urls of the sitemap are crawled one level down
+# The urls that failed to load are added to failed
+async def crawl_site(
+    start_url: str, options: CrawlOptions, failed: set[str] | None = None
+):
+    settings = get_settings()
+    start_url = normalize_url(start_url)
+    seen = {start_url}
+    frontier: asyncio.Queue[tuple[str, int]] = asyncio.Queue()
+    frontier.put_nowait((start_url, 0))
+    # Bounded so a slow ingestion slows the crawl down instead of buffering the site
+    pages: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+
+    def enqueue(url: str, depth: int):
+        if len(seen) >= options.max_pages or url in seen:
+            return
+        if is_allowed(url, start_url, options.same_domain):
+            seen.add(url)
+            frontier.put_nowait((url, depth))
+
+    if options.use_sitemap:
+        for url in await sitemap_urls(start_url):
+            enqueue(url, 1)
+
+    async def worker():
+        while True:
+            url, depth = await frontier.get()
+            try:
+                result = await fetch_page(url)
+                if not result.success:
+                    print(Fore.YELLOW + f"Skipping {url}: {result.error_message}")
+                    if failed is not None:
+                        failed.add(url)
+                    continue
+                if result.markdown:
+                    await pages.put((url, str(result.markdown)))
+                if depth < options.max_depth:
+                    for link in page_links(result, options.same_domain):
+                        enqueue(link, depth + 1)
+            except Exception as e:
+                print(Fore.RED + f"Failed to crawl {url}: {e}")
+                if failed is not None:
+                    failed.add(url)
+            finally:
+                frontier.task_done()
+
+    async def finish():
+        await frontier.join()
+        await pages.put(None)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(settings.CRAWL_CONCURRENCY)]
+    tasks.append(asyncio.create_task(finish()))
+    try:
+        while (page := await pages.get()) is not None:
+            yield page
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
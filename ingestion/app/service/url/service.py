@@ -1,43 +1,126 @@
+import time
+from contextlib import aclosing
 from ..base_ingestion import BaseIngestion
-from crawl4ai import AsyncWebCrawler
-from app.service.qdrant_service import splitter, insert_documents
-import asyncio
+from app.config.settings import get_settings
+from app.schema.ingestion import CrawlOptions
+from app.service.pipeline import run_pipeline
+from app.service.qdrant_service import (
+    sync_documents,
+    build_points,
+    upsert_points,
+    finish_source_update,
+    plan_verified_update,
+    sync_document_sources,
+)
+from app.service.manifest import chunk_id
+from app.service.chunker import chunk_text_with_vectors
+from app.service.progress import record_progress
+from app.service.url.crawler import crawl_site, fetch_page, normalize_url
 from colorama import Fore
-import uuid
 
 
 # Url Ingestion Provider
 class UrlIngestion(BaseIngestion):
-    # Initalize the Url ingestion variables
-    def __init__(self, ingestion_source: str):
+    # Initalize the Url ingestion variables, crawl_options crawls the whole site
+    def __init__(
+        self, ingestion_source: str, crawl_options: CrawlOptions | None = None
+    ):
         super().__init__(ingestion_source)
+        self.crawl_options = crawl_options
 
     # Extract the ingest the url content to the vectordb
     async def extract_and_ingest_data(self):
+        if self.crawl_options is not None:
+            return await self._crawl_and_ingest_data(self.ingestion_source)
         data = await self._extract_data(self.ingestion_source)
-        await self._process_and_store_document(source=self.ingestion_source, text=data)
-        return {"message": "Successfully Ingested Url!"}
+        stats = await self._process_and_store_document(
+            source=self.ingestion_source, text=data
+        )
+        record_progress(pages=1)
+        return {"message": "Successfully Ingested Url!", **stats}
+
+    # Build the documents of the chunks of a page
+    def _build_documents(self, source: str, chunks: list[tuple]):
+        return [
+            {
+                "text": chunk,
+                "source": source,
+                "id": chunk_id(source, chunk),
+                "vector": vector,
+            }
+            for chunk, vector in chunks
+        ]
 
     # Process and store the chunked documents to vector db
     async def _process_and_store_document(self, source: str, text: str):
         """Process a document and store its chunks in parallel."""
-        chunks = await asyncio.to_thread(self._chunk_text, text)
-        docs = [
-            {"text": chunk, "source": source, "id": str(uuid.uuid4())}
-            for chunk in chunks
-        ]
+        chunks = await self._chunk_text(text)
+        docs = self._build_documents(source, chunks)
         print(Fore.CYAN + f"Processing source : {source}")
-        await insert_documents(docs=docs)
+        return await sync_documents(source=source, docs=docs)
 
-    # Split the text into chunks
-    def _chunk_text(self, text: str):
-        chunks = splitter.split_text(text)
+    # Split the text into chunks along with their pooled vectors
+    async def _chunk_text(self, text: str):
+        chunks = await chunk_text_with_vectors(text)
         return chunks
 
     # Extract the markdown from the given url
     async def _extract_data(self, url_source: str):
-        async with AsyncWebCrawler() as crawler:
-            result = await crawler.arun(
-                url=url_source,
+        result = await fetch_page(url_source)
+        if not result.success:
+            raise ValueError(f"Failed to crawl {url_source}: {result.error_message}")
+        return str(result.markdown)
+
+    # Crawl the site and stream every page through chunk -> embed -> upsert stages
+    # as it arrives, every page is stored as its own source
+    async def _crawl_and_ingest_data(self, start_url: str):
+        settings = get_settings()
+        start = time.perf_counter()
+        stats = {"pages": 0, "chunks": 0, "deleted": 0}
+        sources = []
+        # Pages that failed to load keep their chunks until the next crawl
+        failed = set()
+
+        async def chunk_page(page):
+            source, text = page
+            stats["pages"] += 1
+            sources.append(source)
+            chunks = await self._chunk_text(text)
+            record_progress(pages=1)
+            print(Fore.CYAN + f"Processing source : {source}")
+            return await plan_verified_update(
+                source, self._build_documents(source, chunks)
+            )
+
+        async def embed_docs(update):
+            update["points"] = await build_points(update["docs"])
+            return update
+
+        async def upsert_docs(update):
+            await upsert_points(points=update["points"])
+            await finish_source_update(update)
+            stats["chunks"] += len(update["points"])
+            stats["deleted"] += len(update["stale_ids"])
+
+        # Closed even when a stage fails, so the crawl workers stop fetching
+        async with aclosing(
+            crawl_site(start_url, self.crawl_options, failed=failed)
+        ) as pages:
+            await run_pipeline(
+                source=pages,
+                stages=[
+                    (chunk_page, settings.PIPELINE_CHUNK_WORKERS),
+                    (embed_docs, settings.PIPELINE_EMBED_WORKERS),
+                    (upsert_docs, settings.PIPELINE_UPSERT_WORKERS),
+                ],
+                queue_size=settings.PIPELINE_QUEUE_SIZE,
             )
-        return result.markdown
+        # The pages no longer reachable from the start url are deleted
+        stats.update(
+            await sync_document_sources(normalize_url(start_url), [*sources, *failed])
+        )
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        print(
+            Fore.GREEN + f"Crawled {stats['pages']} pages into {stats['chunks']} chunks"
+        )
+        return {"message": "Successfully Crawled Url!", **stats}
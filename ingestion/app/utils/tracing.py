@@ -0,0 +1,62 @@
+import json
+from contextvars import ContextVar
+from app.config.settings import get_settings
+from app.utils.metrics import Histogram
+
+# Latency of every request served
+request_latency = Histogram(
+    "http_request_duration_seconds",
+    "Latency of the requests served by the ingestion service",
+    label_names=("method", "route", "status"),
+)
+# Latency of the stages of the knowledge searches
+search_stage_latency = Histogram(
+    "search_stage_duration_seconds",
+    "Latency of the stages of a knowledge search",
+    label_names=("stage",),
+)
+
+# Stage timings of the request being served, returned in its Server-Timing header
+request_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+
+
+# Record the time a search stage took for the histograms and the current request
+def record_stage(stage: str, seconds: float):
+    search_stage_latency.observe(seconds, stage=stage)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+# Server-Timing header value of the stage timings
+def server_timing(timings: dict, total: float):
+    entries = [
+        f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# Trace id of a W3C traceparent header, None when the header is missing or invalid
+def trace_id(traceparent: str | None):
+    parts = (traceparent or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32:
+        return None
+    return parts[1]
+
+
+# Log the request as a span of the caller's trace with its stage timings
+def log_span(
+    traceparent: str | None, route: str, status: int, timings: dict, total: float
+):
+    if not get_settings().LOG_TRACE_SPANS or (trace := trace_id(traceparent)) is None:
+        return
+    span = {
+        "trace_id": trace,
+        "service": "ingestion",
+        "span": route,
+        "status": status,
+        "stages_ms": {stage: round(s * 1000, 1) for stage, s in timings.items()},
+        "total_ms": round(total * 1000, 1),
+    }
+    print(json.dumps(span))
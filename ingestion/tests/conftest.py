@@ -0,0 +1,6 @@
+import tempfile
+from app.benchmark.ingestion import use_stand_ins
+
+# The tests run against the local stand-ins, in memory qdrant and hash embeddings
+# Must run before the settings are loaded
+use_stand_ins(tempfile.mkdtemp())
@@ -0,0 +1,69 @@
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from app.config.settings import get_settings
+from app.service.pdf.service import PdfIngestion
+from app.service.qdrant_service import (
+    close_qdrant_client,
+    create_new_collection,
+    get_qdrant_client,
+    open_qdrant_client,
+)
+
+
+# Write a pdf with one line of text on every page
+def write_pdf(path, pages: list[str]):
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for text in pages:
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    writer.write(str(path))
+
+
+@pytest.fixture
+async def collection():
+    await open_qdrant_client()
+    await create_new_collection(get_settings().COLLECTION_NAME)
+    yield get_settings().COLLECTION_NAME
+    await close_qdrant_client()
+
+
+async def _sources(collection: str):
+    async with get_qdrant_client() as client:
+        points, _ = await client.scroll(collection, limit=100, with_payload=True)
+    return sorted(point.payload["source"] for point in points)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_pdfs_with_the_same_file_name_keep_their_pages(
+    collection, tmp_path, streaming
+):
+    get_settings().PDF_STREAMING_INGESTION = streaming
+    first, second = tmp_path / "a" / "manual.pdf", tmp_path / "b" / "manual.pdf"
+    first.parent.mkdir()
+    second.parent.mkdir()
+    write_pdf(first, ["The first manual covers the battery"])
+    write_pdf(second, ["The second manual covers the charger"])
+
+    await PdfIngestion(str(first)).extract_and_ingest_data()
+    stats = await PdfIngestion(str(second)).extract_and_ingest_data()
+
+    assert stats["deleted"] == 0
+    assert await _sources(collection) == [
+        str(tmp_path / "a" / "manual_1.pdf"),
+        str(tmp_path / "b" / "manual_1.pdf"),
+    ]
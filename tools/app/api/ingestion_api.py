@@ -1,10 +1,152 @@
+import asyncio
+import json
+import time
 import aiohttp
 from app.config.settings import get_settings
+from app.utils.metrics import Counter, Histogram
+
+# Latency of the calls to the ingestion service
+upstream_latency = Histogram(
+    "ingestion_request_duration_seconds",
+    "Latency of the requests to the ingestion service",
+    label_names=("endpoint",),
+)
+# Calls served by an identical request already in flight
+deduplicated_requests = Counter(
+    "ingestion_deduplicated_requests_total",
+    "Requests that shared an identical in-flight request to the ingestion service",
+    label_names=("endpoint",),
+)
+
+
+# Server lifetime client of the ingestion service
+# Keeps the connections alive between tool calls and lets concurrent
+# identical requests share a single upstream request
+class IngestionClient:
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._in_flight: dict[tuple, asyncio.Task] = {}
+
+    # Create the session on first use so it binds to the server's event loop
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            settings = get_settings()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.INGESTION_POOL_SIZE,
+                    keepalive_timeout=settings.INGESTION_KEEPALIVE_TIMEOUT,
+                ),
+                timeout=aiohttp.ClientTimeout(total=settings.INGESTION_TIMEOUT),
+            )
+        return self._session
+
+    async def _fetch(self, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            async with self._get_session().request(method, url, **kwargs) as response:
+                response.raise_for_status()
+                result = await response.json()
+                log_span(
+                    kwargs.get("headers"),
+                    f"{method} {url}",
+                    response.status,
+                    response.headers.get("Server-Timing"),
+                    time.perf_counter() - start,
+                )
+                return result
+        finally:
+            upstream_latency.observe(time.perf_counter() - start, endpoint=url)
+
+    # Send the request unless an identical one is already in flight
+    # The headers only carry the trace context, they don't make a request distinct
+    async def request(self, method: str, url: str, **kwargs):
+        identity = {name: value for name, value in kwargs.items() if name != "headers"}
+        key = (method, url, json.dumps(identity, sort_keys=True))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(method, url, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            deduplicated_requests.inc(endpoint=url)
+        # A cancelled caller must not cancel the request shared with the others
+        return await asyncio.shield(task)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+# Initalizing the ingestion service client
+ingestion_client = IngestionClient()
+
+
+# Propagate the trace context of the agent's turn to the ingestion service
+def trace_headers(traceparent: str | None):
+    return {"traceparent": traceparent} if traceparent else None
+
+
+# Milliseconds of every stage in a Server-Timing header
+def parse_server_timing(header: str | None):
+    stages = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+# Log the ingestion request as a span of the agent's trace, with the stages the
+# ingestion service reported and the time spent outside of it
+def log_span(
+    headers: dict | None,
+    span: str,
+    status: int,
+    server_timing: str | None,
+    total: float,
+):
+    parts = (headers or {}).get("traceparent", "").split("-")
+    if not get_settings().LOG_TRACE_SPANS or len(parts) != 4:
+        return
+    stages = parse_server_timing(server_timing)
+    upstream_ms = stages.pop("total", None)
+    total_ms = round(total * 1000, 1)
+    record = {
+        "trace_id": parts[1],
+        "service": "tools",
+        "span": span,
+        "status": status,
+        "stages_ms": stages,
+        "upstream_ms": upstream_ms,
+        "network_ms": (
+            round(total_ms - upstream_ms, 1) if upstream_ms is not None else None
+        ),
+        "total_ms": total_ms,
+    }
+    print(json.dumps(record))
 
 
 # Search qdrant api call to ingestion service
-async def search_qdrant_knowledgebase(query: str):
+async def search_qdrant_knowledgebase(query: str, traceparent: str | None = None):
     params = {"query": query}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(get_settings().SEARCH_URL, params=params) as response:
-            return await response.json()
+    return await ingestion_client.request(
+        "GET",
+        get_settings().SEARCH_URL,
+        params=params,
+        headers=trace_headers(traceparent),
+    )
+
+
+# Search several queries at once with the ingestion service batch api
+async def search_qdrant_knowledgebase_batch(
+    queries: list[str], traceparent: str | None = None
+):
+    payload = {"queries": queries}
+    return await ingestion_client.request(
+        "POST",
+        get_settings().SEARCH_BATCH_URL,
+        json=payload,
+        headers=trace_headers(traceparent),
+    )
@@ -0,0 +1,57 @@
+import json
+import os
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+# The agents, tools and ingestion services share no package, each one has an
+# identical copy of this module, keep it small and the copies in sync
+
+# Where the benchmark results are written unless BENCHMARK_RESULTS_DIR is set
+DEFAULT_RESULTS_DIR = "benchmark-results"
+
+
+# p50/p99/mean of latencies given in seconds, in milliseconds
+def latency_summary(seconds: list[float]):
+    if not seconds:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "mean_ms": None}
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p99_ms": round(ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000, 2),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# Write the latest results to <name>.json and append them to <name>.jsonl
+# so the runs of every commit can be compared
+def write_results(name: str, config: dict, results: dict):
+    output_dir = os.environ.get("BENCHMARK_RESULTS_DIR", DEFAULT_RESULTS_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    record = {
+        "benchmark": name,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    path = os.path.join(output_dir, f"{name}.json")
+    with open(path, "w") as file:
+        json.dump(record, file, indent=2)
+    with open(os.path.join(output_dir, f"{name}.jsonl"), "a") as file:
+        file.write(json.dumps(record) + "\n")
+    return path
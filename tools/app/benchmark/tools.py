@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+import time
+from aiohttp import web
+from app.benchmark.results import latency_summary, write_results
+
+# Result returned by the stand-in ingestion service for every query
+CANNED_RESULT = {
+    "id": "benchmark",
+    "score": 0.9,
+    "payload": {"text": "Benchmark answer", "source": "benchmark"},
+}
+
+
+# Stand-in of the ingestion service answering the searches after a fixed delay
+async def start_fake_ingestion(delay: float):
+    async def search(request: web.Request):
+        await asyncio.sleep(delay)
+        return web.json_response([CANNED_RESULT])
+
+    async def search_batch(request: web.Request):
+        queries = (await request.json())["queries"]
+        await asyncio.sleep(delay)
+        return web.json_response([[CANNED_RESULT] for _ in queries])
+
+    app = web.Application()
+    app.router.add_get("/v1/ingest/search", search)
+    app.router.add_post("/v1/ingest/search_batch", search_batch)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/ingest"
+
+
+async def run_benchmark(calls: int, concurrency: int, upstream_delay: float):
+    runner, base_url = await start_fake_ingestion(upstream_delay)
+    # The settings are loaded on first use, after the stand-in is listening
+    os.environ["SEARCH_URL"] = f"{base_url}/search"
+    os.environ["SEARCH_BATCH_URL"] = f"{base_url}/search_batch"
+    from fastmcp import Client
+    from app.api.ingestion_api import ingestion_client
+    from app.main import mcp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = {"knowledge_search": [], "knowledge_search_batch": []}
+
+    async def timed(client: Client, tool: str, arguments: dict):
+        async with semaphore:
+            start = time.perf_counter()
+            await client.call_tool(tool, arguments)
+            latencies[tool].append(time.perf_counter() - start)
+
+    try:
+        # In memory transport, the measured latency is the tool and upstream call
+        async with Client(mcp) as client:
+            # Every query is distinct so no call is served by the request deduplication
+            await asyncio.gather(
+                *[
+                    timed(client, "knowledge_search", {"query": f"question {i}"})
+                    for i in range(calls)
+                ]
+            )
+            await asyncio.gather(
+                *[
+                    timed(
+                        client,
+                        "knowledge_search_batch",
+                        {"queries": [f"question {i}", f"follow up {i}"]},
+                    )
+                    for i in range(calls)
+                ]
+            )
+    finally:
+        await ingestion_client.close()
+        await runner.cleanup()
+
+    results = {}
+    for tool, values in latencies.items():
+        summary = latency_summary(values)
+        summary["p50_overhead_ms"] = round(summary["p50_ms"] - upstream_delay * 1000, 2)
+        results[tool] = summary
+    config = {
+        "calls": calls,
+        "concurrency": concurrency,
+        "upstream_delay_ms": upstream_delay * 1000,
+        "ingestion": "aiohttp stand-in",
+    }
+    path = write_results("tools", config, results)
+    print(f"{results}\nResults written to {path}")
+    return results
+
+
+# Poetry run statement to benchmark the mcp tool latency against a stand-in
+# ingestion service, arguments: calls, concurrency, upstream delay in seconds
+def run_tool_benchmark():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    upstream_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    asyncio.run(run_benchmark(calls, concurrency, upstream_delay))
@@ -5,6 +5,13 @@ from functools import lru_cache
 # Import all settings
 class Settings(BaseSettings):
     SEARCH_URL: str
+    SEARCH_BATCH_URL: str = "http://localhost:8000/v1/ingest/search_batch"
+    # Connection pool and timeout of the ingestion service client
+    INGESTION_POOL_SIZE: int = 20
+    INGESTION_KEEPALIVE_TIMEOUT: float = 30
+    INGESTION_TIMEOUT: float = 10
+    # Log a json span of every traced ingestion request with its Server-Timing stages
+    LOG_TRACE_SPANS: bool = True
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,12 +1,39 @@
 from fastmcp import FastMCP
-from app.api.ingestion_api import search_qdrant_knowledgebase
+from app.api.ingestion_api import (
+    ingestion_client,
+    search_qdrant_knowledgebase,
+    search_qdrant_knowledgebase_batch,
+)
+from app.utils.metrics import Histogram, render_metrics
 from fastmcp.utilities.logging import get_logger
+from fastmcp.server.dependencies import get_context
+from contextlib import asynccontextmanager
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+import time
+import uvicorn
 
 mcp = FastMCP("Voice Agent Mcp Server")
 
 # Intailzing the mcp logge
 logger = get_logger(__name__)
 
+# Latency of every tool call
+tool_latency = Histogram(
+    "mcp_tool_call_duration_seconds",
+    "Latency of the mcp tool calls",
+    label_names=("tool", "status"),
+)
+
+
+# Trace context the agent sent in the _meta of the tool call
+def get_traceparent():
+    try:
+        meta = get_context().request_context.meta
+    except (RuntimeError, ValueError):
+        return None
+    return getattr(meta, "traceparent", None) if meta else None
+
 
 # Tool to query from the ingested knowledge base
 @mcp.tool(
@@ -15,16 +42,73 @@ logger = get_logger(__name__)
     description="This tools is used to perform knowledge search",
 )
 async def qdrant_knowledge_search(query: str):
+    start, status = time.perf_counter(), "ok"
     try:
-        logger.info(f"Searching Query in Knowledge Base: {query}")
-        results = await search_qdrant_knowledgebase(query=query)
+        traceparent = get_traceparent()
+        logger.info(
+            f"Searching Query in Knowledge Base: {query} (traceparent {traceparent})"
+        )
+        results = await search_qdrant_knowledgebase(
+            query=query, traceparent=traceparent
+        )
         logger.info(f"Search Results Found : {results}")
         logger.info(f"Number of relevant results found: {len(results)}")
         return results
     except Exception as e:
+        status = "error"
         logger.error(f"Reterival failed: {str(e)}")
+    finally:
+        tool_latency.observe(
+            time.perf_counter() - start, tool="knowledge_search", status=status
+        )
+
+
+# Tool to query several questions from the knowledge base in one call
+@mcp.tool(
+    name="knowledge_search_batch",
+    title="Qdrant Knowleadge Batch Search Tool",
+    description="This tools is used to perform knowledge search for several queries at once, results are returned in the order of the queries",
+)
+async def qdrant_knowledge_search_batch(queries: list[str]):
+    start, status = time.perf_counter(), "ok"
+    try:
+        traceparent = get_traceparent()
+        logger.info(
+            f"Searching {len(queries)} Queries in Knowledge Base: {queries} (traceparent {traceparent})"
+        )
+        results = await search_qdrant_knowledgebase_batch(
+            queries=queries, traceparent=traceparent
+        )
+        logger.info(f"Search Results Found : {results}")
+        return results
+    except Exception as e:
+        status = "error"
+        logger.error(f"Reterival failed: {str(e)}")
+    finally:
+        tool_latency.observe(
+            time.perf_counter() - start, tool="knowledge_search_batch", status=status
+        )
+
+
+# Prometheus style latency histograms of the tool calls
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request):
+    return PlainTextResponse(render_metrics())
 
 
 # Poetry run command to start the mcp server
 def start_mcp_server():
-    mcp.run(transport="streamable-http", host="0.0.0.0", port=8005)
+    mcp_app = mcp.http_app(transport="streamable-http")
+    mcp_lifespan = mcp_app.router.lifespan_context
+
+    # Close the ingestion client along with the server
+    @asynccontextmanager
+    async def lifespan(app):
+        async with mcp_lifespan(app):
+            try:
+                yield
+            finally:
+                await ingestion_client.close()
+
+    mcp_app.router.lifespan_context = lifespan
+    uvicorn.run(mcp_app, host="0.0.0.0", port=8005)
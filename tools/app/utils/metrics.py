@@ -0,0 +1,103 @@
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+# The services share no package, each one has its own copy of this module with
+# only the metric types it uses
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# Prometheus style histogram with optional labels
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            # Per series: the count of every bucket, the sum and the total count
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    # Render the histogram in the prometheus text format
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                labels = [
+                    f'{name}="{value}"' for name, value in zip(self.label_names, key)
+                ]
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                    lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+                bucket_labels = ",".join([*labels, 'le="+Inf"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+                suffix = f"{{{','.join(labels)}}}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {total}")
+                lines.append(f"{self.name}_count{suffix} {count}")
+        return "\n".join(lines)
+
+
+# Prometheus style counter with optional labels
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in self._values.items():
+                labels = ",".join(
+                    f'{name}="{label}"' for name, label in zip(self.label_names, key)
+                )
+                lines.append(
+                    f"{self.name}{{{labels}}} {value}"
+                    if labels
+                    else f"{self.name} {value}"
+                )
+        return "\n".join(lines)
+
+
+# Every metric created in the process
+registry: List = []
+
+
+# Render all the metrics for the /metrics route
+def render_metrics():
+    return "\n".join(metric.render() for metric in registry) + "\n"